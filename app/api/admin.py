@@ -0,0 +1,21 @@
+"""
+Admin endpoints.
+"""
+
+from fastapi import APIRouter
+from app.db import slow_queries
+from app.models.admin import SlowQuery
+from app.models.responses import APIResponse
+
+router = APIRouter()
+
+
+@router.get("/slow-queries")
+async def get_slow_queries() -> APIResponse[list[SlowQuery]]:
+    """
+    Returns the most recent slow queries, newest first, with their sampled plans.
+    """
+    return APIResponse(
+        data=slow_queries.recent_slow_queries(),
+        message="Slow queries fetched successfully"
+    )
@@ -3,41 +3,82 @@ Authors endpoints.
 """
 
 from typing import Annotated
-from fastapi import APIRouter, Depends, Query, Path
-from app.db.connection import get_db
+from fastapi import APIRouter, Depends, Query, Path, Request, Response, Header
+from fastapi.responses import StreamingResponse
+from app.db.connection import get_db, get_read_db
+from app.core import conditional, fast_responses
+from app.core.config import settings
+from app.core.constants import ExportFormat, EXPORT_MEDIA_TYPES
 from app.services import authors as authors_service
 from app.models import authors as authors_models
-from app.models.responses import APIResponse
+from app.models.responses import APIResponse, PaginatedAPIResponse, PageMeta, BulkImportResult
 
 router = APIRouter()
 
 
-# NOTE :: GOOD TO HAVE: Accept a parameter to return all the books associated with each author.
 @router.get("")
 async def get_all_authors(
-    db=Depends(get_db),
+    db=Depends(get_read_db),
     offset: Annotated[int, Query(ge=0, description="Starting index")] = 0,
     limit: Annotated[int, Query(
-        ge=1, le=100, description="Number of items to retrieve")] = 10
-) -> APIResponse[list[authors_models.Author]]:
+        ge=1, le=100, description="Number of items to retrieve")] = 10,
+    cursor: Annotated[str | None, Query(
+        description="Opaque cursor from a previous page's next_cursor")] = None,
+    include: Annotated[authors_models.AuthorInclude | None, Query(
+        description="Related records to return with each author")] = None,
+    include_total: Annotated[bool, Query(
+        description="Also return the total, exact or estimated, in meta")] = False
+) -> PaginatedAPIResponse[list[authors_models.AuthorWithBooks | authors_models.Author]]:
     """Returns all the authors in the library."""
-    all_authors = authors_service.get_all_authors_service(db, offset, limit)
-    return APIResponse(
+    all_authors, next_cursor = await authors_service.get_all_authors_service(db, offset, limit, cursor, include)
+    meta = PageMeta(next_cursor=next_cursor)
+    if include_total:
+        meta.total, meta.total_estimated = await authors_service.count_authors_service(db)
+    if settings.fast_list_responses:
+        return fast_responses.envelope_response(all_authors, "Authors fetched successfully", meta.model_dump())
+    return PaginatedAPIResponse(
         data=all_authors,
-        message="Authors fetched successfully"
+        message="Authors fetched successfully",
+        meta=meta
+    )
+
+
+@router.get("/export")
+async def export_authors(
+    export_format: Annotated[ExportFormat, Query(alias="format", description="Output format")] = ExportFormat.NDJSON
+) -> StreamingResponse:
+    """
+    Streams all the authors as NDJSON or CSV.
+    """
+    stream = await authors_service.export_authors_service(export_format)
+    return StreamingResponse(
+        stream,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f"attachment; filename=authors.{export_format.value}"}
     )
 
 
-# NOTE :: GOOD TO HAVE: Accept a parameter to return all the books associated with the author.
 @router.get("/{author_id}")
 async def get_author(
     author_id: Annotated[int, Path()],
-    db=Depends(get_db)
-) -> APIResponse[authors_models.Author]:
+    response: Response,
+    db=Depends(get_read_db),
+    include: Annotated[authors_models.AuthorInclude | None, Query(
+        description="Related records to return with the author")] = None,
+    if_none_match: Annotated[str | None, Header(description="ETag of a previously fetched version")] = None
+) -> APIResponse[authors_models.AuthorWithBooks | authors_models.Author]:
     """
     Returns the Author corresponding to the given author_id.
+    Answers 304 when the ETag given in If-None-Match is still current. The
+    author's version doesn't cover its books, so ?include=books has no ETag.
     """
-    author = authors_service.get_author_service(db, author_id)
+    if include is None and if_none_match:
+        version = await authors_service.get_author_version_service(db, author_id)
+        if version is not None and conditional.etag_matches(if_none_match, conditional.row_etag(version)):
+            return conditional.not_modified(conditional.row_etag(version))
+    author = await authors_service.get_author_service(db, author_id, include)
+    if include is None:
+        response.headers["ETag"] = conditional.row_etag(author["version"])
     return APIResponse(
         data=author,
         message='Author fetched successfully'
@@ -52,13 +93,31 @@ async def create_author(
     """
     Adds a new Author to the library.
     """
-    added_author = authors_service.add_new_author_service(db, author)
+    added_author = await authors_service.add_new_author_service(db, author)
     return APIResponse(
         data=added_author,
         message="Author added successfully"
     )
 
 
+@router.post("/bulk")
+async def bulk_create_authors(
+    request: Request,
+    db=Depends(get_db)
+) -> APIResponse[BulkImportResult]:
+    """
+    Adds authors in bulk from a streamed NDJSON (application/x-ndjson) or
+    CSV (text/csv, with a header line) body holding one author per line.
+    Invalid rows are reported back without failing the rest of the batch.
+    """
+    result = await authors_service.bulk_import_authors_service(
+        db, request.stream(), request.headers.get("content-type"))
+    return APIResponse(
+        data=result,
+        message="Authors imported"
+    )
+
+
 @router.put("/{author_id}")
 async def update_author(
     author_id: Annotated[int, Path()],
@@ -68,7 +127,7 @@ async def update_author(
     """
     Update an existing Author.
     """
-    updated_author = authors_service.update_author_service(db, author_id, author.model_dump(exclude_unset=True))
+    updated_author = await authors_service.update_author_service(db, author_id, author.model_dump(exclude_unset=True))
 
     return APIResponse(
         data=updated_author,
@@ -85,5 +144,5 @@ async def delete_author(
     """
     Deletes the Author corresponsing to given ID.
     """
-    authors_service.delete_author_service(db, author_id)
+    await authors_service.delete_author_service(db, author_id)
     return APIResponse(message="Author deleted.")
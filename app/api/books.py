@@ -3,40 +3,76 @@ Books APIs router
 """
 
 from typing import Annotated
-from fastapi import APIRouter, Depends, Query, Path
-from app.db.connection import get_db
+from fastapi import APIRouter, Depends, Query, Path, Request, Response, Header
+from fastapi.responses import StreamingResponse
+from app.db.connection import get_db, get_read_db
+from app.core import conditional, fast_responses
+from app.core.config import settings
+from app.core.constants import ExportFormat, EXPORT_MEDIA_TYPES
 from app.services import books as books_service
 from app.models import books as books_models
-from app.models.responses import APIResponse
+from app.models.responses import APIResponse, PaginatedAPIResponse, PageMeta, BulkImportResult
 
 router = APIRouter()
 
 @router.get("")
 async def get_all_books(
-    db=Depends(get_db),
+    db=Depends(get_read_db),
     filters: books_models.BookFilters = Depends(),
     offset: Annotated[int, Query(ge=0, description="Starting index")]=0,
-    limit: Annotated[int, Query(ge=1, le=100, description="Number of items to retrieve")]=10
-) -> APIResponse[list[books_models.Book]]:
+    limit: Annotated[int, Query(ge=1, le=100, description="Number of items to retrieve")]=10,
+    cursor: Annotated[str | None, Query(description="Opaque cursor from a previous page's next_cursor")]=None,
+    sort: Annotated[books_models.BookSort, Query(description="Order by title, or by search relevance")]=books_models.BookSort.TITLE,
+    include_total: Annotated[bool, Query(description="Also return the total, exact or estimated, in meta")]=False
+) -> PaginatedAPIResponse[list[books_models.Book]]:
     """
     Returns all the books in the library with their basic info.
     """
-    all_books = books_service.get_all_books_service(db, filters, offset, limit)
-    return APIResponse(
+    all_books, next_cursor = await books_service.get_all_books_service(db, filters, offset, limit, cursor, sort)
+    meta = PageMeta(next_cursor=next_cursor)
+    if include_total:
+        meta.total, meta.total_estimated = await books_service.count_books_service(db, filters)
+    if settings.fast_list_responses:
+        return fast_responses.envelope_response(all_books, "Books fetched successfully", meta.model_dump())
+    return PaginatedAPIResponse(
         data=all_books,
-        message="Books fetched successfully"
+        message="Books fetched successfully",
+        meta=meta
+    )
+
+
+@router.get("/export")
+async def export_books(
+    export_format: Annotated[ExportFormat, Query(alias="format", description="Output format")] = ExportFormat.NDJSON
+) -> StreamingResponse:
+    """
+    Streams all the books as NDJSON or CSV.
+    """
+    stream = await books_service.export_books_service(export_format)
+    return StreamingResponse(
+        stream,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f"attachment; filename=books.{export_format.value}"}
     )
 
 
 @router.get("/{book_id}")
 async def get_book(
     book_id: Annotated[int, Path()],
-    db=Depends(get_db)
+    response: Response,
+    db=Depends(get_read_db),
+    if_none_match: Annotated[str | None, Header(description="ETag of a previously fetched version")] = None
 ) -> APIResponse[books_models.Book]:
     """
     Returns the books corresponding to the given book_id
+    Answers 304 when the ETag given in If-None-Match is still current.
     """
-    book = books_service.get_book_service(db, book_id)
+    if if_none_match:
+        version = await books_service.get_book_version_service(db, book_id)
+        if version is not None and conditional.etag_matches(if_none_match, conditional.row_etag(version)):
+            return conditional.not_modified(conditional.row_etag(version))
+    book = await books_service.get_book_service(db, book_id)
+    response.headers["ETag"] = conditional.row_etag(book["version"])
     return APIResponse(
         data=book,
         message='Book fetched successfully'
@@ -51,13 +87,31 @@ async def create_book(
     """
     Adds a new book to the library.
     """
-    added_book = books_service.add_new_book_service(db, book)
+    added_book = await books_service.add_new_book_service(db, book)
     return APIResponse(
         data=added_book,
         message="Book added successfully"
     )
 
 
+@router.post("/bulk")
+async def bulk_create_books(
+    request: Request,
+    db=Depends(get_db)
+) -> APIResponse[BulkImportResult]:
+    """
+    Adds books in bulk from a streamed NDJSON (application/x-ndjson) or
+    CSV (text/csv, with a header line) body holding one book per line. CSV author_ids are separated by ';'.
+    Invalid rows are reported back without failing the rest of the batch.
+    """
+    result = await books_service.bulk_import_books_service(
+        db, request.stream(), request.headers.get("content-type"))
+    return APIResponse(
+        data=result,
+        message="Books imported"
+    )
+
+
 @router.put("/{book_id}")
 async def update_book(
     book_id: Annotated[int, Path()],
@@ -67,7 +121,7 @@ async def update_book(
     """
     Update an existing book.
     """
-    book_id = books_service.update_book_service(db, book_id, book.dict(exclude_unset=True))
+    book_id = await books_service.update_book_service(db, book_id, book.dict(exclude_unset=True))
     return APIResponse(
         data=book_id,
         message="Book updated successfully"
@@ -82,5 +136,5 @@ async def delete_book(
     """
     Deletes the book corresponsing to given book_id.
     """
-    books_service.delete_book_service(db, book_id)
+    await books_service.delete_book_service(db, book_id)
     return APIResponse(message="Book deleted")
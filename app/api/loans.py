@@ -0,0 +1,72 @@
+"""
+Loans endpoints.
+"""
+
+from typing import Annotated
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from app.db.connection import get_read_db
+from app.core import fast_responses
+from app.core.config import settings
+from app.core.constants import ExportFormat, EXPORT_MEDIA_TYPES
+from app.services import loans as loans_service
+from app.models import loans as loans_models
+from app.models.responses import APIResponse, PaginatedAPIResponse, PageMeta
+
+router = APIRouter()
+
+
+@router.get("/overdue")
+async def get_overdue_loans(
+    db=Depends(get_read_db),
+    filters: loans_models.OverdueLoanFilters = Depends(),
+    offset: Annotated[int, Query(ge=0, description="Starting index")] = 0,
+    limit: Annotated[int, Query(
+        ge=1, le=100, description="Number of items to retrieve")] = 10,
+    cursor: Annotated[str | None, Query(
+        description="Opaque cursor from a previous page's next_cursor")] = None
+) -> PaginatedAPIResponse[list[loans_models.OverdueLoan]]:
+    """Returns the active loans past their due date, most overdue first."""
+    overdue_loans, next_cursor = await loans_service.get_overdue_loans_service(db, filters, offset, limit, cursor)
+    meta = PageMeta(next_cursor=next_cursor)
+    if settings.fast_list_responses:
+        return fast_responses.envelope_response(overdue_loans, "Overdue loans fetched successfully", meta.model_dump())
+    return PaginatedAPIResponse(
+        data=overdue_loans,
+        message="Overdue loans fetched successfully",
+        meta=meta
+    )
+
+
+@router.get("/overdue/export")
+async def export_overdue_loans(
+    filters: loans_models.OverdueLoanFilters = Depends(),
+    export_format: Annotated[ExportFormat, Query(alias="format", description="Output format")] = ExportFormat.NDJSON
+) -> StreamingResponse:
+    """
+    Streams every overdue loan matching the filters as NDJSON or CSV.
+    """
+    stream = await loans_service.export_overdue_loans_service(filters, export_format)
+    return StreamingResponse(
+        stream,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f"attachment; filename=overdue_loans.{export_format.value}"}
+    )
+
+
+@router.get("/overdue/patrons")
+async def get_overdue_patrons(
+    db=Depends(get_read_db),
+    filters: loans_models.OverdueLoanFilters = Depends(),
+    offset: Annotated[int, Query(ge=0, description="Starting index")] = 0,
+    limit: Annotated[int, Query(
+        ge=1, le=100, description="Number of items to retrieve")] = 10
+) -> APIResponse[list[loans_models.OverduePatronSummary]]:
+    """Returns the overdue loans rolled up per patron, longest overdue first."""
+    overdue_patrons = await loans_service.get_overdue_patrons_service(db, filters, offset, limit)
+    if settings.fast_list_responses:
+        return fast_responses.envelope_response(overdue_patrons, "Overdue patrons fetched successfully")
+    return APIResponse(
+        data=overdue_patrons,
+        message="Overdue patrons fetched successfully"
+    )
@@ -0,0 +1,53 @@
+"""
+Metrics endpoint.
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core import metrics
+from app.db.connection import get_pool_stats, get_pools, pool_wait_histogram
+from app.services.books import book_cache
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Pool counters exposed as gauges labelled by pool: (stats key, metric name, help)
+POOL_GAUGES = (
+    ("size", "db_pool_size", "Connections currently open."),
+    ("max_size", "db_pool_max_size", "Maximum connections of the pool."),
+    ("idle", "db_pool_idle", "Open connections waiting to be used."),
+    ("in_use", "db_pool_in_use", "Connections checked out of the pool."),
+    ("waiting", "db_pool_waiting", "Requests waiting for a connection."),
+    ("requests_queued", "db_pool_requests_queued", "Requests that had to wait for a connection."),
+    ("requests_failed", "db_pool_requests_failed", "Requests that failed to get a connection."),
+    ("connections_lost", "db_pool_connections_lost", "Connections found broken and discarded."),
+)
+
+# Book cache counters: (stats key, metric name, help)
+BOOK_CACHE_COUNTERS = (
+    ("hits", "book_cache_hits_total", "Single book lookups served by the cache."),
+    ("misses", "book_cache_misses_total", "Single book lookups that missed the cache."),
+)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics() -> PlainTextResponse:
+    """
+    Returns the request, DB pool and book cache metrics in the Prometheus text format.
+    """
+    lines = []
+    for family in metrics.REQUEST_HISTOGRAMS:
+        lines.extend(family.render())
+
+    pool_stats = {pool: get_pool_stats(pool) for pool in get_pools()}
+    for key, name, help_text in POOL_GAUGES:
+        lines.extend(metrics.render_labeled_gauge(
+            name, help_text, "pool", {pool: stats[key] for pool, stats in pool_stats.items()}))
+    lines.extend(pool_wait_histogram.render())
+
+    cache_stats = book_cache.stats()
+    for key, name, help_text in BOOK_CACHE_COUNTERS:
+        lines.extend(metrics.render_counter(name, help_text, cache_stats[key]))
+
+    return PlainTextResponse("\n".join(lines) + "\n", media_type=PROMETHEUS_CONTENT_TYPE)
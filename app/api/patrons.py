@@ -3,45 +3,106 @@ Patrons endpoints.
 """
 
 from typing import Annotated
-from fastapi import APIRouter, Depends, Query, Path
-from app.db.connection import get_db
+from fastapi import APIRouter, Depends, Query, Path, Request, Response, Header
+from fastapi.responses import StreamingResponse
+from app.db.connection import get_db, get_read_db
+from app.core import conditional, fast_responses
+from app.core.config import settings
+from app.core.constants import ExportFormat, EXPORT_MEDIA_TYPES
 from app.services import patrons as patrons_service
 from app.models import patrons as patrons_models
-from app.models.responses import APIResponse
+from app.models.responses import APIResponse, PaginatedAPIResponse, PageMeta, BulkImportResult
 
 router = APIRouter()
 
 
 @router.get("")
 async def get_all_patrons(
-    db=Depends(get_db),
+    db=Depends(get_read_db),
     offset: Annotated[int, Query(ge=0, description="Starting index")] = 0,
     limit: Annotated[int, Query(
-        ge=1, le=100, description="Number of items to retrieve")] = 10
-) -> APIResponse[list[patrons_models.Patron]]:
+        ge=1, le=100, description="Number of items to retrieve")] = 10,
+    cursor: Annotated[str | None, Query(
+        description="Opaque cursor from a previous page's next_cursor")] = None,
+    include_total: Annotated[bool, Query(
+        description="Also return the total, exact or estimated, in meta")] = False
+) -> PaginatedAPIResponse[list[patrons_models.Patron]]:
     """Returns all the Patrons associated with the library."""
-    all_patrons = patrons_service.get_all_patrons_service(db, offset, limit)
-    return APIResponse(
+    all_patrons, next_cursor = await patrons_service.get_all_patrons_service(db, offset, limit, cursor)
+    meta = PageMeta(next_cursor=next_cursor)
+    if include_total:
+        meta.total, meta.total_estimated = await patrons_service.count_patrons_service(db)
+    if settings.fast_list_responses:
+        return fast_responses.envelope_response(all_patrons, "patrons fetched successfully", meta.model_dump())
+    return PaginatedAPIResponse(
         data=all_patrons,
-        message="patrons fetched successfully"
+        message="patrons fetched successfully",
+        meta=meta
+    )
+
+
+@router.get("/export")
+async def export_patrons(
+    export_format: Annotated[ExportFormat, Query(alias="format", description="Output format")] = ExportFormat.NDJSON
+) -> StreamingResponse:
+    """
+    Streams all the patrons as NDJSON or CSV.
+    """
+    stream = await patrons_service.export_patrons_service(export_format)
+    return StreamingResponse(
+        stream,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f"attachment; filename=patrons.{export_format.value}"}
     )
 
 
 @router.get("/{patron_id}")
 async def get_patron(
     patron_id: Annotated[int, Path()],
-    db=Depends(get_db)
+    response: Response,
+    db=Depends(get_read_db),
+    if_none_match: Annotated[str | None, Header(description="ETag of a previously fetched version")] = None
 ) -> APIResponse[patrons_models.Patron]:
     """
     Returns the patron corresponding to the given patron_id.
+    Answers 304 when the ETag given in If-None-Match is still current.
     """
-    patron = patrons_service.get_patron_service(db, patron_id)
+    if if_none_match:
+        version = await patrons_service.get_patron_version_service(db, patron_id)
+        if version is not None and conditional.etag_matches(if_none_match, conditional.row_etag(version)):
+            return conditional.not_modified(conditional.row_etag(version))
+    patron = await patrons_service.get_patron_service(db, patron_id)
+    response.headers["ETag"] = conditional.row_etag(patron["version"])
     return APIResponse(
         data=patron,
         message='patrons fetched successfully'
     )
 
 
+@router.get("/{patron_id}/loans")
+async def get_patron_loans(
+    patron_id: Annotated[int, Path()],
+    db=Depends(get_read_db),
+    state: Annotated[patrons_models.LoanState | None, Query(
+        alias="status", description="Only the active, returned or overdue loans")] = None,
+    offset: Annotated[int, Query(ge=0, description="Starting index")] = 0,
+    limit: Annotated[int, Query(
+        ge=1, le=100, description="Number of items to retrieve")] = 10,
+    cursor: Annotated[str | None, Query(
+        description="Opaque cursor from a previous page's next_cursor")] = None
+) -> PaginatedAPIResponse[list[patrons_models.PatronLoan]]:
+    """Returns the loans of the patron, newest first."""
+    loans, next_cursor = await patrons_service.get_patron_loans_service(db, patron_id, state, offset, limit, cursor)
+    meta = PageMeta(next_cursor=next_cursor)
+    if settings.fast_list_responses:
+        return fast_responses.envelope_response(loans, "Patron loans fetched successfully", meta.model_dump())
+    return PaginatedAPIResponse(
+        data=loans,
+        message="Patron loans fetched successfully",
+        meta=meta
+    )
+
+
 @router.post("")
 async def create_patron(
     patron: patrons_models.PatronCreate,
@@ -50,13 +111,31 @@ async def create_patron(
     """
     Adds a new Patron to the library.
     """
-    added_patron = patrons_service.add_new_patron_service(db, patron)
+    added_patron = await patrons_service.add_new_patron_service(db, patron)
     return APIResponse(
         data=added_patron,
         message="Patron added successfully"
     )
 
 
+@router.post("/bulk")
+async def bulk_create_patrons(
+    request: Request,
+    db=Depends(get_db)
+) -> APIResponse[BulkImportResult]:
+    """
+    Adds patrons in bulk from a streamed NDJSON (application/x-ndjson) or
+    CSV (text/csv, with a header line) body holding one patron per line.
+    Invalid rows are reported back without failing the rest of the batch.
+    """
+    result = await patrons_service.bulk_import_patrons_service(
+        db, request.stream(), request.headers.get("content-type"))
+    return APIResponse(
+        data=result,
+        message="Patrons imported"
+    )
+
+
 @router.put("/{patron_id}")
 async def update_patron(
     patron_id: Annotated[int, Path()],
@@ -66,7 +145,7 @@ async def update_patron(
     """
     Update an existing Patron.
     """
-    updated_patron = patrons_service.update_patron_service(db, patron_id, patron.model_dump(exclude_unset=True))
+    updated_patron = await patrons_service.update_patron_service(db, patron_id, patron.model_dump(exclude_unset=True))
 
     return APIResponse(
         data=updated_patron,
@@ -80,7 +159,7 @@ async def borrow_book(
     book_id: int,
     db=Depends(get_db)
 ) -> APIResponse[int]:
-    loan_id = patrons_service.borrow_book_service(db, patron_id, book_id)
+    loan_id = await patrons_service.borrow_book_service(db, patron_id, book_id)
 
     return APIResponse(
         message="Happy reading!",
@@ -88,6 +167,23 @@ async def borrow_book(
     )
 
 
+@router.post("/{patron_id}/borrow/batch")
+async def borrow_books(
+    patron_id: Annotated[int, Path()],
+    batch: patrons_models.BatchLoanRequest,
+    db=Depends(get_db)
+) -> APIResponse[patrons_models.BatchLoanResult]:
+    """
+    Lend several books at once, reporting the outcome of each book.
+    With mode=all_or_nothing no book is lent unless all of them can be.
+    """
+    result = await patrons_service.borrow_books_service(db, patron_id, batch.book_ids, batch.mode)
+    return APIResponse(
+        data=result,
+        message="Happy reading!" if result.committed else "No books were lent."
+    )
+
+
 @router.post("/{patron_id}/return")
 async def return_book(
     patron_id: Annotated[int, Path()],
@@ -97,5 +193,22 @@ async def return_book(
     """
     Process a book return.
     """
-    patrons_service.return_book_service(db, patron_id, book_id)
+    await patrons_service.return_book_service(db, patron_id, book_id)
     return APIResponse(message="Return accepted!")
+
+
+@router.post("/{patron_id}/return/batch")
+async def return_books(
+    patron_id: Annotated[int, Path()],
+    batch: patrons_models.BatchLoanRequest,
+    db=Depends(get_db)
+) -> APIResponse[patrons_models.BatchLoanResult]:
+    """
+    Process the return of several books at once, reporting the outcome of each book.
+    With mode=all_or_nothing no book is returned unless all of them can be.
+    """
+    result = await patrons_service.return_books_service(db, patron_id, batch.book_ids, batch.mode)
+    return APIResponse(
+        data=result,
+        message="Returns accepted!" if result.committed else "No books were returned."
+    )
@@ -2,34 +2,72 @@
 API Key based Authentication middleware
 """
 
+import hmac
+from fastapi import status
 from fastapi.responses import JSONResponse
-from fastapi import Request, status
-from starlette.middleware.base import BaseHTTPMiddleware
 from app.core.config import settings
 from app.core.constants import ErrorCode
 from app.models.responses import APIResponse, ErrorDetail
 
+# The 401 response never changes, so it is serialized once at import time
+UNAUTHORIZED_BODY = JSONResponse(
+    content=APIResponse[None](
+        success=False,
+        message="Invalid or missing API Key",
+        data=None,
+        error=ErrorDetail(code=ErrorCode.UNAUTHORIZED)
+    ).model_dump()
+).body
 
-class APIKeyAuthMiddleware(BaseHTTPMiddleware):
+UNAUTHORIZED_START = {
+    "type": "http.response.start",
+    "status": status.HTTP_401_UNAUTHORIZED,
+    "headers": [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(UNAUTHORIZED_BODY)).encode()),
+    ],
+}
+
+UNAUTHORIZED_MESSAGE = {"type": "http.response.body", "body": UNAUTHORIZED_BODY}
+
+# Policy violation close code for unauthenticated websocket handshakes
+WS_POLICY_VIOLATION = 1008
+
+
+class APIKeyAuthMiddleware:
     """
-    Authenticates requests by matching its API key
+    Authenticates requests by matching its API key.
+
+    Implemented as a plain ASGI middleware so that authenticated requests are
+    handed to the app untouched, without the extra task and body wrapping of
+    BaseHTTPMiddleware.
     """
-    async def dispatch(self, request: Request, call_next):
-        # Let the documentation endpoints bypass authentication
-        if request.url.path in ["/docs", "/openapi.json", "/redoc"]:
-            return await call_next(request)
-
-        # Authenticate the request
-        api_key = request.headers.get('X-API-KEY')
-        if api_key is None or api_key != settings.api_key:
-            response_data = APIResponse[None](
-                success=False,
-                message="Invalid or missing API Key",
-                data=None,
-                error=ErrorDetail(code=ErrorCode.UNAUTHORIZED)
-            )
-            return JSONResponse(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                content=response_data.model_dump()
-            )
-        return await call_next(request)
+    def __init__(self, app, api_key: str | None = None, bypass_paths=None):
+        self.app = app
+        self.api_key = (api_key if api_key is not None else settings.api_key).encode()
+        self.bypass_paths = frozenset(
+            bypass_paths if bypass_paths is not None else settings.auth_bypass_paths
+        )
+
+    async def __call__(self, scope, receive, send):
+        # Lifespan events and the bypass paths (e.g. documentation) skip authentication
+        if scope["type"] not in ("http", "websocket") or scope["path"] in self.bypass_paths:
+            await self.app(scope, receive, send)
+            return
+
+        # Authenticate the request. ASGI header names are lowercased bytes.
+        api_key = None
+        for name, value in scope["headers"]:
+            if name == b"x-api-key":
+                api_key = value
+                break
+
+        if api_key is not None and hmac.compare_digest(api_key, self.api_key):
+            await self.app(scope, receive, send)
+            return
+
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": WS_POLICY_VIOLATION})
+            return
+        await send(UNAUTHORIZED_START)
+        await send(UNAUTHORIZED_MESSAGE)
@@ -0,0 +1,47 @@
+"""
+Read consistency middleware
+"""
+
+from app.db.consistency import SessionConsistency, current_session, parse_lsn
+
+SESSION_TOKEN_HEADER = b"x-session-token"
+# Requests that may write, whose WAL position is returned as a session token
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+class ReadConsistencyMiddleware:
+    """
+    Carries session tokens between clients and the connection layer.
+
+    The X-Session-Token of a request holds the WAL position its reads must
+    see. Requests that write get back, in the same header, the position of
+    the primary after their writes, to send along with their next reads.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = None
+        for name, value in scope["headers"]:
+            if name == SESSION_TOKEN_HEADER:
+                token = value.decode("latin-1")
+                break
+        session = SessionConsistency(parse_lsn(token), tracks_writes=scope["method"] in WRITE_METHODS)
+        context_token = current_session.set(session)
+
+        async def send_with_session_token(message):
+            # Connections are released, and the writes committed, before the response starts
+            if message["type"] == "http.response.start" and session.written_lsn:
+                headers = list(message.get("headers", []))
+                headers.append((SESSION_TOKEN_HEADER, session.written_lsn.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_session_token)
+        finally:
+            current_session.reset(context_token)
@@ -0,0 +1,48 @@
+"""
+Request id middleware
+"""
+
+import uuid
+from app.core.logger import current_request_id
+
+REQUEST_ID_HEADER = b"x-request-id"
+# Longer client supplied ids are replaced, so they can't bloat every log record
+MAX_REQUEST_ID_LENGTH = 128
+
+
+class RequestIdMiddleware:
+    """
+    Tags each request with an id, carried by its log records and echoed in
+    the X-Request-ID response header.
+
+    A client supplied X-Request-ID is kept, so that requests can be traced
+    across services.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                request_id = value.decode("latin-1")
+                break
+        if not request_id or len(request_id) > MAX_REQUEST_ID_LENGTH:
+            request_id = uuid.uuid4().hex
+        token = current_request_id.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER, request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            current_request_id.reset(token)
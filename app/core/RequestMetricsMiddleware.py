@@ -0,0 +1,63 @@
+"""
+Request metrics middleware
+"""
+
+import time
+from app.core.metrics import RequestMetrics, current_request_metrics, observe_request
+
+# Label of requests that matched no route, so unknown paths can't grow the metrics unbounded
+UNMATCHED_ROUTE = "unmatched"
+
+
+def server_timing(request_metrics: RequestMetrics, elapsed: float) -> bytes:
+    """
+    Server-Timing header value; durations are in milliseconds.
+    """
+    return (
+        f'db;dur={request_metrics.db_seconds * 1000:.2f};'
+        f'desc="{request_metrics.queries} queries, {request_metrics.rows} rows", '
+        f'pool;dur={request_metrics.pool_wait_seconds * 1000:.2f}, '
+        f'app;dur={elapsed * 1000:.2f}'
+    ).encode()
+
+
+class RequestMetricsMiddleware:
+    """
+    Accounts the database usage of each request.
+
+    Reports it in a Server-Timing header and aggregates it, along with the
+    request duration, into per-route histograms once the response is sent,
+    whether or not the request failed.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_metrics = RequestMetrics()
+        token = current_request_metrics.set(request_metrics)
+        started = time.perf_counter()
+        # Requests failing before they respond are reported as server errors
+        response_status = 500
+
+        async def send_with_timing(message):
+            nonlocal response_status
+            if message["type"] == "http.response.start":
+                response_status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(request_metrics, time.perf_counter() - started)))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request_metrics.reset(token)
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or UNMATCHED_ROUTE
+            observe_request(
+                scope["method"], route_path, response_status, time.perf_counter() - started, request_metrics)
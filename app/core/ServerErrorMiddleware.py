@@ -0,0 +1,41 @@
+"""
+Server error middleware
+"""
+
+from starlette.requests import Request
+from app.core.exception_handlers import global_exception_handler
+
+
+class ServerErrorMiddleware:
+    """
+    Turns unhandled exceptions into the 500 response of the global exception
+    handler, inside the app's middlewares.
+
+    Starlette handles them in its outermost middleware, so the response would
+    bypass ours: no request id, no Server-Timing header, no status in the
+    request metrics. The exception is raised again once the response is sent,
+    so that the server still logs it.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_tracking_start(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_tracking_start)
+        except Exception as exc:
+            if not response_started:
+                response = await global_exception_handler(Request(scope), exc)
+                await response(scope, receive, send)
+            raise
@@ -0,0 +1,114 @@
+"""
+Caching utils
+"""
+
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class CacheBackend(ABC):
+    """
+    Storage interface of the cache.
+    Methods are async so that network backed stores can be plugged in.
+    """
+    @abstractmethod
+    async def get(self, key: Hashable) -> Any | None:
+        """Return the value stored under key, or None if absent or expired."""
+
+    @abstractmethod
+    async def set(self, key: Hashable, value: Any):
+        """Store value under key."""
+
+    @abstractmethod
+    async def delete(self, key: Hashable):
+        """Drop key if present."""
+
+    @abstractmethod
+    async def clear(self):
+        """Drop every key."""
+
+
+class InMemoryLRUBackend(CacheBackend):
+    """
+    Bounded, per-process LRU store whose entries expire after ttl seconds.
+    """
+    def __init__(self, max_entries: int = 1024, ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key):
+        self._entries.pop(key, None)
+
+    async def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class Cache:
+    """
+    Read-through cache front end that counts hits and misses.
+
+    Every invalidation bumps a generation counter. Readers take the generation
+    before loading a value and hand it to set, which drops the value if an
+    invalidation happened meanwhile: the value may predate the write that
+    caused it, and caching it would undo the invalidation.
+    """
+    def __init__(self, backend: CacheBackend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+
+    async def get(self, key: Hashable) -> Any | None:
+        """Return the cached value for key, or None on a miss."""
+        if not self.enabled:
+            return None
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: Hashable, value: Any, generation: int | None = None):
+        """
+        Cache value under key, unless the cache was invalidated since
+        'generation' was taken, before loading value.
+        """
+        if self.enabled and (generation is None or generation == self.generation):
+            await self.backend.set(key, value)
+
+    async def invalidate(self, key: Hashable | None = None):
+        """Drop key, or every entry when no key is given."""
+        self.generation += 1
+        if key is None:
+            await self.backend.clear()
+        else:
+            await self.backend.delete(key)
+
+    def stats(self) -> dict:
+        """Hit and miss counters."""
+        return {"hits": self.hits, "misses": self.misses}
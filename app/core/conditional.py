@@ -0,0 +1,32 @@
+"""
+HTTP conditional requests
+
+Single record reads send the row version as a strong ETag. A request whose
+If-None-Match still matches it is answered with an empty 304 from a
+version-only lookup, without running the full query.
+"""
+
+from fastapi import Response, status
+
+
+def row_etag(version: int) -> str:
+    """ETag of a row version."""
+    return f'"{version}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches etag.
+    If-None-Match uses the weak comparison, so W/ prefixes are ignored.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tag = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == tag for candidate in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    """Empty 304 response carrying the current ETag."""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
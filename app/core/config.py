@@ -12,14 +12,68 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env")
 
     app_name: str = "Library API"
+
+    log_level: str = "INFO"
+    log_file: str = "app.log"
+    # Levels of individual loggers, e.g. {"psycopg": "WARNING"}
+    log_levels: dict[str, str] = {}
+    # Share of DEBUG records kept (1 keeps them all)
+    log_debug_sample_rate: float = 1.0
+
     db_host: str
     db_name: str
     db_user: str
     db_password: str
     db_port: str
+    # Read replica of the primary, sharing its name and credentials. GET
+    # routes read from it once it caught up with the client's session token.
+    db_replica_host: str | None = None
+    db_replica_port: str | None = None
+    # Seconds a read waits for the replica to catch up before using the primary
+    db_replica_wait_timeout: float = 0.2
     minconn: int = 1
     maxconn: int = 10
+    # Seconds a request waits for a free connection before giving up
+    db_pool_timeout: float = 5.0
+    # Max requests queued for a connection (0 = unbounded)
+    db_pool_max_waiting: int = 0
+    # Seconds after which a connection is closed and replaced
+    db_pool_max_lifetime: float = 3600.0
+    # Seconds an idle connection above minconn is kept before closing
+    db_pool_max_idle: float = 600.0
+    # Validate connections with a round trip before handing them out
+    db_pool_check: bool = True
+    # Prepare registered statements once per connection. Disable behind
+    # transaction pooling proxies (e.g. PgBouncer), which can't keep them.
+    db_prepared_statements: bool = True
+    # Prepared statements kept per connection before the least recently used is dropped
+    db_prepared_max: int = 256
+
+    # Read-through cache of single book lookups
+    book_cache_enabled: bool = True
+    book_cache_max_entries: int = 1024
+    book_cache_ttl: float = 30.0
+
+    # Encode the rows of the listing endpoints with orjson, skipping their
+    # validation through the response models
+    fast_list_responses: bool = False
+
+    # Listing totals (?include_total=true) up to this many rows are counted
+    # exactly; larger ones are the planner's estimate
+    exact_count_limit: int = 10000
+
+    # Max books per author returned with ?include=books
+    author_books_limit: int = 50
+
+    # Queries slower than this are logged and kept for GET /admin/slow-queries
+    slow_query_threshold_ms: float = 200.0
+    slow_query_buffer_size: int = 100
+    # Share of slow queries whose plan is captured with EXPLAIN ANALYZE (0 disables)
+    slow_query_explain_sample_rate: float = 0.1
+    slow_query_explain_timeout_ms: int = 5000
 
     api_key: str
+    # Request paths served without an API key
+    auth_bypass_paths: set[str] = {"/docs", "/docs/oauth2-redirect", "/openapi.json", "/redoc", "/metrics"}
 
 settings = Settings()
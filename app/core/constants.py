@@ -16,3 +16,18 @@ class ErrorCode(str, Enum):
     DATABASE_ERROR = "database_error"
     NOT_FOUND = "not_found"
     UNAUTHORIZED = "unauthorized"
+    SERVICE_UNAVAILABLE = "service_unavailable"
+
+
+class ExportFormat(str, Enum):
+    """
+    Output formats of the export endpoints
+    """
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
@@ -169,3 +169,21 @@ async def business_validation_exception_handler(request: Request, exc: custom_ex
         status_code=exc.status_code,
         content=response_data.model_dump()
     )
+
+
+async def database_busy_exception_handler(request: Request, exc: custom_exceptions.DatabaseBusyException):
+    """
+    Handle connection pool exhaustion.
+    """
+    response_data = APIResponse[None](
+        success=False,
+        message=exc.detail,
+        data=None,
+        error=ErrorDetail(code=ErrorCode.SERVICE_UNAVAILABLE)
+    )
+
+    return JSONResponse(
+        status_code=exc.status_code,
+        content=response_data.model_dump(),
+        headers={"Retry-After": "1"}
+    )
@@ -67,3 +67,11 @@ class BusinessValidationException(CustomAPIException):
     """
     def __init__(self, detail: str = "Business validation failed."):
         super().__init__(detail, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+
+class DatabaseBusyException(CustomAPIException):
+    """
+    Raised when no database connection frees up within the pool timeout.
+    """
+    def __init__(self, detail: str = "The service is busy, please retry shortly."):
+        super().__init__(detail, status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -0,0 +1,21 @@
+"""
+Fast response serialization
+
+Listing endpoints can skip FastAPI's validation of their rows through the
+response models: the rows come straight from our own queries, whose columns
+match the models, so they are trusted and encoded to JSON by orjson inside
+the usual response envelope.
+"""
+
+from fastapi.responses import ORJSONResponse
+
+
+def envelope_response(data, message: str, meta: dict | None = None) -> ORJSONResponse:
+    """
+    The APIResponse envelope of trusted data, or the PaginatedAPIResponse
+    one when meta is given, encoded without building model instances.
+    """
+    content = {"success": True, "message": message, "data": data, "error": None}
+    if meta is not None:
+        content["meta"] = meta
+    return ORJSONResponse(content)
@@ -1,29 +1,114 @@
 """
 Customised App logger
+
+Log calls only enqueue the record: formatting and the console and file I/O
+happen on a background thread, off the event loop. Logging is configured by
+the app lifespan, not on import.
 """
 
+import json
 import logging
+import logging.handlers
+import queue
+import random
 import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+# Id of the request being served; None outside of requests
+current_request_id: ContextVar[str | None] = ContextVar("current_request_id", default=None)
+
+logger = logging.getLogger("app")
+
+_listener: logging.handlers.QueueListener | None = None
+_queue_handler: logging.Handler | None = None
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats records as single line JSON objects.
+    """
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
 
-def configure_logging(level="INFO", log_file="app.log"):
-    """Configures the global logging settings."""
-    logger = logging.getLogger()
-    logger.setLevel(level)
+class RequestQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records along with the id of the request that logged them.
+    """
+    def prepare(self, record):
+        # Runs in the logging caller, where the request context is still set
+        record.request_id = current_request_id.get()
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
 
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+class DebugSampler(logging.Filter):
+    """
+    Keeps only a 'rate' share of the DEBUG records.
+    """
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+def configure_logging(level="INFO", log_file="app.log", logger_levels: dict[str, str] | None = None,
+                      debug_sample_rate: float = 1.0):
+    """Configures the global logging settings and starts the writer thread."""
+    global _listener, _queue_handler
+    shutdown_logging()
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for name, logger_level in (logger_levels or {}).items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    formatter = JSONFormatter()
 
     # Console handler
     ch = logging.StreamHandler(sys.stdout)
     ch.setFormatter(formatter)
-    logger.addHandler(ch)
 
     # File handler
     fh = logging.FileHandler(log_file)
     fh.setFormatter(formatter)
-    logger.addHandler(fh)
 
+    log_queue = queue.SimpleQueue()
+    _queue_handler = RequestQueueHandler(log_queue)
+    if debug_sample_rate < 1:
+        _queue_handler.addFilter(DebugSampler(debug_sample_rate))
+    root.addHandler(_queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, ch, fh, respect_handler_level=True)
+    _listener.start()
     return logger
 
 
-logger = configure_logging("DEBUG")
+def shutdown_logging():
+    """Flushes the queued records and stops the writer thread."""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
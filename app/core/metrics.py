@@ -0,0 +1,156 @@
+"""
+In-process metric primitives
+"""
+
+from bisect import bisect_left
+from contextvars import ContextVar
+
+# Upper bounds in seconds, tuned for DB and request latencies.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with Prometheus style cumulative buckets.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # One slot per bucket plus the trailing +Inf slot
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """Record a single observation."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> dict:
+        """Return the cumulative bucket counts along with sum and count."""
+        cumulative = {}
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            cumulative[str(bound)] = running
+        cumulative["+Inf"] = self.count
+        return {"buckets": cumulative, "sum": self.sum, "count": self.count}
+
+
+# Upper bounds for per-request counts (queries, rows).
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class HistogramFamily:
+    """
+    Histograms sharing a name, one per combination of label values.
+    """
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.histograms: dict[tuple, Histogram] = {}
+
+    def labels(self, *values) -> Histogram:
+        """Return the histogram of the given label values, in label_names order."""
+        histogram = self.histograms.get(values)
+        if histogram is None:
+            histogram = self.histograms[values] = Histogram(self.buckets)
+        return histogram
+
+    def render(self) -> list[str]:
+        """Prometheus text exposition lines of the family."""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for values, histogram in sorted(self.histograms.items()):
+            lines.extend(render_histogram_samples(self.name, histogram, dict(zip(self.label_names, values))))
+        return lines
+
+
+def render_histogram_samples(name: str, histogram: Histogram, labels: dict | None = None) -> list[str]:
+    """Prometheus sample lines (buckets, sum and count) of a single histogram."""
+    label_pairs = [f'{key}="{escape_label_value(value)}"' for key, value in (labels or {}).items()]
+    label_text = ",".join(label_pairs)
+    snapshot = histogram.snapshot()
+    lines = []
+    for bound, count in snapshot["buckets"].items():
+        bucket_labels = ",".join(label_pairs + [f'le="{bound}"'])
+        lines.append(f"{name}_bucket{{{bucket_labels}}} {count}")
+    lines.append(f"{name}_sum{{{label_text}}} {snapshot['sum']}")
+    lines.append(f"{name}_count{{{label_text}}} {snapshot['count']}")
+    return lines
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_labeled_gauge(name: str, help_text: str, label_name: str, values: dict) -> list[str]:
+    """Prometheus text exposition lines of a gauge with a sample per value of a single label."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for label_value, value in values.items():
+        lines.append(f'{name}{{{label_name}="{escape_label_value(label_value)}"}} {value}')
+    return lines
+
+
+def render_counter(name: str, help_text: str, value) -> list[str]:
+    """Prometheus text exposition lines of a single unlabeled counter."""
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} counter", f"{name} {value}"]
+
+
+class RequestMetrics:
+    """
+    Database usage of a single request.
+    """
+    __slots__ = ("queries", "db_seconds", "rows", "pool_wait_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.pool_wait_seconds = 0.0
+
+
+# Metrics of the request being served; None outside of requests
+current_request_metrics: ContextVar[RequestMetrics | None] = ContextVar("current_request_metrics", default=None)
+
+
+def record_query(seconds: float, rows: int):
+    """Account a query against the current request, if any."""
+    request_metrics = current_request_metrics.get()
+    if request_metrics is not None:
+        request_metrics.queries += 1
+        request_metrics.db_seconds += seconds
+        request_metrics.rows += rows
+
+
+def record_pool_wait(seconds: float):
+    """Account a pool checkout wait against the current request, if any."""
+    request_metrics = current_request_metrics.get()
+    if request_metrics is not None:
+        request_metrics.pool_wait_seconds += seconds
+
+
+ROUTE_LABELS = ("method", "route")
+
+request_duration = HistogramFamily(
+    "http_request_duration_seconds", "Time spent serving requests.", ROUTE_LABELS + ("status",))
+request_db_duration = HistogramFamily(
+    "http_request_db_duration_seconds", "Time spent in database queries per request.", ROUTE_LABELS)
+request_pool_wait = HistogramFamily(
+    "http_request_db_pool_wait_seconds", "Time spent waiting for a pooled connection per request.", ROUTE_LABELS)
+request_db_queries = HistogramFamily(
+    "http_request_db_queries", "Database queries run per request.", ROUTE_LABELS, COUNT_BUCKETS)
+request_db_rows = HistogramFamily(
+    "http_request_db_rows", "Rows returned by the database per request.", ROUTE_LABELS, COUNT_BUCKETS)
+
+REQUEST_HISTOGRAMS = (request_duration, request_db_duration, request_pool_wait, request_db_queries, request_db_rows)
+
+
+def observe_request(method: str, route: str, status: int, seconds: float, request_metrics: RequestMetrics):
+    """Aggregate a finished request into the per-route histograms."""
+    request_duration.labels(method, route, str(status)).observe(seconds)
+    request_db_duration.labels(method, route).observe(request_metrics.db_seconds)
+    request_pool_wait.labels(method, route).observe(request_metrics.pool_wait_seconds)
+    request_db_queries.labels(method, route).observe(request_metrics.queries)
+    request_db_rows.labels(method, route).observe(request_metrics.rows)
@@ -0,0 +1,54 @@
+"""
+Keyset (cursor) pagination utils
+"""
+
+import base64
+import json
+from datetime import date
+from app.core import exceptions as custom_exceptions
+
+
+def encode_cursor(row: dict, keys: dict[str, type]) -> str:
+    """
+    Encode the sort key values of a row into an opaque cursor.
+    Dates are encoded as ISO strings.
+    """
+    payload = json.dumps([row[key] for key in keys], separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: dict[str, type]) -> dict:
+    """
+    Decode a cursor produced by encode_cursor back into its sort key values.
+    keys maps each sort column to the type its value must have.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        raise custom_exceptions.BusinessValidationException("Invalid cursor.")
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise custom_exceptions.BusinessValidationException("Invalid cursor.")
+    decoded = {}
+    for (key, expected_type), value in zip(keys.items(), values):
+        if expected_type is date:
+            # Dates travel as ISO strings
+            try:
+                value = date.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise custom_exceptions.BusinessValidationException("Invalid cursor.")
+        elif type(value) is not expected_type:
+            raise custom_exceptions.BusinessValidationException("Invalid cursor.")
+        decoded[key] = value
+    return decoded
+
+
+def paginate(rows: list, limit: int, keys: dict[str, type]):
+    """
+    Trim a result fetched with limit + 1 rows to the page size.
+    Returns the page and the cursor of the next page, if there is one.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(page[-1], keys)
@@ -2,44 +2,315 @@
 Database utils
 """
 
-import psycopg2
-from psycopg2.pool import SimpleConnectionPool
+import asyncio
+import time
+from contextlib import asynccontextmanager, AsyncExitStack
+from weakref import WeakKeyDictionary
+import psycopg
+from psycopg import pq
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool, PoolTimeout, TooManyRequests
 from fastapi import HTTPException
 from app.core.config import settings
+from app.core import exceptions as custom_exceptions
+from app.core.logger import logger
+from app.core.metrics import HistogramFamily, current_request_metrics, record_pool_wait
+from app.db.consistency import current_session, read_after_lsn
+from app.db.helpers import execute
+from app.db.instrumentation import InstrumentedCursor
+from app.db.statements import statement
 
-db_pool = None
+db_pool: AsyncConnectionPool | None = None
+# Pool of the read replica, None when reads go to the primary
+replica_pool: AsyncConnectionPool | None = None
 
+# Seconds between two checks of a replica catching up with a session token
+REPLICA_POLL_INTERVAL = 0.01
 
-def get_db_pool():
+# Names of the pools, as labelled in the metrics
+PRIMARY_POOL = "primary"
+REPLICA_POOL = "replica"
+
+# Seconds spent waiting for a connection, observed on every checkout
+pool_wait_histogram = HistogramFamily(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled connection.", ("pool",))
+
+# Callbacks registered with after_transaction, per checked out connection
+_transaction_hooks: WeakKeyDictionary = WeakKeyDictionary()
+
+
+def get_conninfo(host: str | None = None, port: str | None = None) -> str:
+    """
+    Build the libpq connection string from the app settings, for the primary
+    or for the server at the given host and port.
+    """
+    return make_conninfo(
+        host=host or settings.db_host,
+        dbname=settings.db_name,
+        user=settings.db_user,
+        password=settings.db_password,
+        port=port or settings.db_port
+    )
+
+
+async def configure_connection(conn: psycopg.AsyncConnection):
+    """
+    Per-connection setup, run by the pool for every new connection.
+    """
+    conn.cursor_factory = InstrumentedCursor
+    if settings.db_prepared_statements:
+        conn.prepared_max = settings.db_prepared_max
+    else:
+        # Transaction pooling proxies may route each statement to a different
+        # server connection, so nothing can be prepared.
+        conn.prepare_threshold = None
+
+
+def create_pool(conninfo: str) -> AsyncConnectionPool:
+    """
+    A connection pool configured from the app settings, not yet opened.
+    """
+    return AsyncConnectionPool(
+        conninfo=conninfo,
+        min_size=settings.minconn,
+        max_size=settings.maxconn,
+        timeout=settings.db_pool_timeout,
+        max_waiting=settings.db_pool_max_waiting,
+        max_lifetime=settings.db_pool_max_lifetime,
+        max_idle=settings.db_pool_max_idle,
+        check=AsyncConnectionPool.check_connection if settings.db_pool_check else None,
+        configure=configure_connection,
+        open=False
+    )
+
+
+async def open_db_pool():
+    """
+    Create and open the DB pools. Called once from the app lifespan.
+    """
+    global db_pool, replica_pool
+    if db_pool is None:
+        db_pool = create_pool(get_conninfo())
+        await db_pool.open()
+    if replica_pool is None and settings.db_replica_host:
+        replica_pool = create_pool(get_conninfo(settings.db_replica_host, settings.db_replica_port))
+        await replica_pool.open()
+    return db_pool
+
+
+async def close_db_pool():
+    """
+    Close the DB pools. Called once from the app lifespan.
+    """
+    global db_pool, replica_pool
+    if replica_pool is not None:
+        await replica_pool.close()
+        replica_pool = None
+    if db_pool is not None:
+        await db_pool.close()
+        db_pool = None
+
+
+def get_db_pool() -> AsyncConnectionPool:
     """
     DB pool getter
     """
-    global db_pool
     if db_pool is None:
-        try:
-            db_pool = SimpleConnectionPool(
-                minconn=settings.minconn,
-                maxconn=settings.maxconn,
-                host=settings.db_host,
-                database=settings.db_name,
-                user=settings.db_user,
-                password=settings.db_password,
-                port=settings.db_port
-            )
-        except psycopg2.OperationalError as e:
-            # TODO :: log error here
-            raise HTTPException(
-                status_code=500, detail="Database connection error")
+        raise HTTPException(
+            status_code=500, detail="Database connection error")
     return db_pool
 
 
-def get_db():
+def get_pools() -> dict[str, AsyncConnectionPool]:
+    """
+    The open pools by name: the primary's, and the replica's when there is one.
     """
-    DB connection getter
+    pools = {PRIMARY_POOL: get_db_pool()}
+    if replica_pool is not None:
+        pools[REPLICA_POOL] = replica_pool
+    return pools
+
+
+def get_pool_stats(name: str = PRIMARY_POOL) -> dict:
     """
-    pool = get_db_pool()
-    conn = pool.getconn()
+    Snapshot of the saturation counters of the named pool.
+    """
+    pool = get_pools()[name]
+    stats = pool.get_stats()
+    return {
+        "size": stats.get("pool_size", 0),
+        "max_size": stats.get("pool_max", settings.maxconn),
+        "idle": stats.get("pool_available", 0),
+        "in_use": stats.get("pool_size", 0) - stats.get("pool_available", 0),
+        "waiting": stats.get("requests_waiting", 0),
+        "requests_queued": stats.get("requests_queued", 0),
+        "requests_failed": stats.get("requests_errors", 0),
+        "connections_lost": stats.get("connections_lost", 0),
+        "wait_seconds": pool_wait_histogram.labels(name).snapshot()
+    }
+
+
+@asynccontextmanager
+async def db_connection(replica: bool = False):
+    """
+    Check a connection out of the primary's pool, or out of the replica's
+    when 'replica' is set, for the duration of the block.
+    """
+    pool = replica_pool if replica else get_db_pool()
+    started = time.perf_counter()
+    # The pool's connection check runs a query; count it as pool wait only
+    request_metrics_token = current_request_metrics.set(None)
+    try:
+        conn = await pool.getconn()
+    except (PoolTimeout, TooManyRequests):
+        raise custom_exceptions.DatabaseBusyException()
+    except psycopg.OperationalError:
+        logger.exception("Could not connect to the database")
+        raise HTTPException(
+            status_code=500, detail="Database connection error")
+    finally:
+        current_request_metrics.reset(request_metrics_token)
+        waited = time.perf_counter() - started
+        pool_wait_histogram.labels(REPLICA_POOL if replica else PRIMARY_POOL).observe(waited)
+        record_pool_wait(waited)
     try:
         yield conn
+    except BaseException:
+        # Discard whatever a request that failed midway left behind
+        status = conn.info.transaction_status
+        if status == pq.TransactionStatus.INTRANS and not await has_written(conn):
+            # Nothing to undo: commit, as psycopg drops its prepared statements on every rollback
+            await conn.commit()
+        elif status in (pq.TransactionStatus.INTRANS, pq.TransactionStatus.INERROR):
+            await conn.rollback()
+        raise
+    else:
+        # End the implicit transaction left open by read-only queries with a
+        # commit: psycopg drops its prepared statements on every rollback.
+        status = conn.info.transaction_status
+        if status == pq.TransactionStatus.INTRANS:
+            await conn.commit()
+        elif status == pq.TransactionStatus.INERROR:
+            await conn.rollback()
+        if not replica and replica_pool is not None:
+            await record_written_lsn(conn)
     finally:
-        db_pool.putconn(conn)
+        hooks = _transaction_hooks.pop(conn, ())
+        await pool.putconn(conn)
+        for hook in hooks:
+            await hook()
+
+
+async def has_written(conn: psycopg.AsyncConnection) -> bool:
+    """
+    Whether the open transaction on conn has written anything, which is when
+    Postgres assigns it a transaction id. Read-only transactions have none.
+    """
+    sql = statement("connection.has_written", "SELECT pg_current_xact_id_if_assigned() IS NOT NULL;")
+    try:
+        async with conn.cursor() as cursor:
+            await execute(cursor, sql)
+            return (await cursor.fetchone())[0]
+    except psycopg.Error:
+        return True
+
+
+def after_transaction(conn: psycopg.AsyncConnection, hook):
+    """
+    Await hook() once the request is done with conn, after its last
+    transaction was committed or rolled back.
+
+    Query functions commit their own writes, and a request may fail after
+    one of them did, so hooks run either way: they are meant for work that
+    is safe to repeat, such as cache invalidation.
+    """
+    _transaction_hooks.setdefault(conn, []).append(hook)
+
+
+async def record_written_lsn(conn: psycopg.AsyncConnection):
+    """
+    Hand the primary's WAL position, taken after the request's writes were
+    committed, to the session token of a writing request.
+    """
+    session = current_session.get()
+    if session is None or not session.tracks_writes:
+        return
+    sql = statement("consistency.written_lsn", "SELECT pg_current_wal_insert_lsn()::text;")
+    async with conn.cursor() as cursor:
+        await execute(cursor, sql)
+        session.written_lsn = (await cursor.fetchone())[0]
+    await conn.commit()
+
+
+async def replica_caught_up(conn: psycopg.AsyncConnection, lsn: str) -> bool:
+    """
+    Whether the replica has replayed the WAL up to lsn, waiting for it up to
+    DB_REPLICA_WAIT_TIMEOUT seconds.
+    """
+    # NULL outside of recovery: the server isn't a standby, so it can't lag
+    sql = statement("consistency.replayed", """
+    SELECT coalesce(pg_last_wal_replay_lsn() >= %(lsn)s::pg_lsn, true);
+    """)
+    deadline = time.monotonic() + settings.db_replica_wait_timeout
+    async with conn.cursor() as cursor:
+        while True:
+            await execute(cursor, sql, {"lsn": lsn})
+            if (await cursor.fetchone())[0]:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(REPLICA_POLL_INTERVAL)
+
+
+@asynccontextmanager
+async def read_connection():
+    """
+    Check out a connection for reads: from the replica when there is one and
+    it has caught up with the request's session token, from the primary otherwise.
+    """
+    if replica_pool is None:
+        async with db_connection() as conn:
+            yield conn
+        return
+
+    lsn = read_after_lsn()
+    async with AsyncExitStack() as stack:
+        conn = await stack.enter_async_context(db_connection(replica=True))
+        if lsn is not None and not await replica_caught_up(conn, lsn):
+            # Too far behind: release the replica and read from the primary
+            await stack.aclose()
+            conn = await stack.enter_async_context(db_connection())
+        yield conn
+
+
+async def get_db():
+    """
+    DB connection getter, for routes that write
+    """
+    async with db_connection() as conn:
+        yield conn
+
+
+async def get_read_db():
+    """
+    DB connection getter, for read only routes
+    """
+    async with read_connection() as conn:
+        yield conn
+
+
+async def stream_with_db(stream_factory, *args):
+    """
+    Stream stream_factory(conn, *args) on a connection checked out when the
+    stream is first iterated, releasing it once the stream is exhausted or closed.
+
+    Streamed response bodies are sent after request dependencies are torn
+    down, so they cannot use the connection from get_db. The checkout is lazy
+    so that a response whose body is never iterated (the client went away, or
+    an error was raised before it was sent) holds no connection; pool errors
+    therefore abort the stream instead of producing an error response.
+    Streams only read, so they are served by the replica when there is one.
+    """
+    async with read_connection() as conn:
+        async for chunk in stream_factory(conn, *args):
+            yield chunk
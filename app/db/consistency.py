@@ -0,0 +1,48 @@
+"""
+Read-your-writes consistency across the primary and its replicas
+
+A request that writes to the primary gets back a session token holding the
+primary's WAL position after its writes. Reads sent with that token are
+served by a replica only once the replica has replayed up to it, so a client
+always sees its own writes.
+"""
+
+import re
+from contextvars import ContextVar
+
+# WAL positions as printed by Postgres, e.g. 16/B374D848
+LSN_PATTERN = re.compile(r"^[0-9A-Fa-f]{1,8}/[0-9A-Fa-f]{1,8}$")
+
+
+class SessionConsistency:
+    """
+    WAL positions of a single request: the one its reads must see, from the
+    client's session token, and the one its writes reached on the primary.
+    """
+    __slots__ = ("read_after_lsn", "written_lsn", "tracks_writes")
+
+    def __init__(self, read_after_lsn: str | None = None, tracks_writes: bool = False):
+        self.read_after_lsn = read_after_lsn
+        self.written_lsn = None
+        self.tracks_writes = tracks_writes
+
+
+# Consistency state of the request being served; None outside of requests
+current_session: ContextVar[SessionConsistency | None] = ContextVar("current_session", default=None)
+
+
+def parse_lsn(token: str | None) -> str | None:
+    """
+    The WAL position of a session token, None for missing or malformed tokens.
+    """
+    if token and LSN_PATTERN.match(token):
+        return token
+    return None
+
+
+def read_after_lsn() -> str | None:
+    """
+    The WAL position the reads of the current request must see, if any.
+    """
+    session = current_session.get()
+    return session.read_after_lsn if session is not None else None
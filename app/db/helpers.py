@@ -2,46 +2,113 @@
 Helper functions for database operations
 """
 
-import psycopg2
-from psycopg2.extras import execute_values
-from fastapi import HTTPException
+import psycopg
+from app.core.logger import logger
+from app.db.statements import prepare_mode, statement
 
 
-def fetchall_dict(cursor):
+async def fetchall_dict(cursor):
     """Return all rows from a cursor as a list of dictionaries."""
     columns = [col.name for col in cursor.description]
-    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    return [dict(zip(columns, row)) for row in await cursor.fetchall()]
 
 
-def execute_sql_fetch_one(db, sql, params=None):
+async def execute(cursor, sql, params=None):
+    """
+    Execute a statement on the cursor, preparing registered statements once per connection.
+    """
+    return await cursor.execute(sql, params, prepare=prepare_mode(sql))
+
+
+async def stream_copy_out(db, sql, params=None):
+    """
+    Run a COPY ... TO STDOUT statement and yield its output as byte chunks.
+    """
+    async with db.cursor() as cursor:
+        async with cursor.copy(sql, params) as copy:
+            async for chunk in copy:
+                yield bytes(chunk)
+
+
+async def stream_text_rows(db, sql, params=None, *, batch_size=1000):
+    """
+    Run a query returning a single text column through a server-side cursor
+    and yield its rows as newline terminated byte chunks, one per batch.
+    Memory use is bound by batch_size, however many rows the query returns.
+    """
+    async with db.cursor(name="stream_text_rows") as cursor:
+        await cursor.execute(sql, params)
+        while True:
+            rows = await cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield "".join(f"{row[0]}\n" for row in rows).encode()
+
+
+async def execute_sql_fetch_one(db, sql, params=None):
     """Executes a SQL query and returns a single result as a dictionary."""
     try:
-        with db.cursor() as cursor:
-            cursor.execute(sql, params)
-            result = cursor.fetchone()
+        async with db.cursor() as cursor:
+            await execute(cursor, sql, params)
+            result = await cursor.fetchone()
             if result:
                 return dict(zip([col.name for col in cursor.description], result))
             else:
                 return None
-    except psycopg2.Error as e:
-        # TODO :: log error here
-        db.rollback()
+    except psycopg.Error:
+        logger.exception("Query %s failed", getattr(sql, "name", "(ad-hoc)"))
+        await db.rollback()
         raise
 
 
-def execute_sql_fetch_all(db, sql, params=None):
+async def execute_sql_fetch_all(db, sql, params=None):
     """Executes a SQL query and returns all results as a list of dictionaries."""
     try:
-        with db.cursor() as cursor:
-            cursor.execute(sql, params)
-            return fetchall_dict(cursor)
-    except psycopg2.Error as e:
-        # TODO :: log error here
-        db.rollback()
+        async with db.cursor() as cursor:
+            await execute(cursor, sql, params)
+            return await fetchall_dict(cursor)
+    except psycopg.Error:
+        logger.exception("Query %s failed", getattr(sql, "name", "(ad-hoc)"))
+        await db.rollback()
         raise
 
 
-def execute_sql(
+async def estimate_rows(db, sql, params=None) -> int:
+    """
+    The planner's estimate of the rows a query returns, without running it.
+    """
+    async with db.cursor() as cursor:
+        # Never prepared: the plan, hence the estimate, depends on the params
+        await cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params, prepare=False)
+        plan = (await cursor.fetchone())[0]
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def count_rows(db, name, from_where, params=None, *, exact_limit):
+    """
+    Count the rows matched by a 'FROM ... WHERE ...' clause.
+    Returns the total and whether it is an estimate.
+
+    Totals the planner expects to be at most exact_limit are counted, scanning
+    no more than exact_limit + 1 rows in case it underestimated. Larger ones
+    are returned as the planner's estimate rather than scanned.
+    The count is registered under 'name', which must identify from_where.
+    """
+    params = dict(params or {})
+    estimate = await estimate_rows(db, f"SELECT 1 {from_where}", params)
+    if estimate <= exact_limit:
+        sql = statement(name, f"""
+        SELECT count(*) AS total FROM (SELECT 1 {from_where} LIMIT %(count_limit)s) matching;
+        """)
+        params["count_limit"] = exact_limit + 1
+        total = (await execute_sql_fetch_one(db, sql, params))["total"]
+        if total <= exact_limit:
+            return total, False
+        estimate = max(estimate, total)
+    return estimate, True
+
+
+async def execute_sql(
     db,
     sql,
     params=None,
@@ -59,29 +126,30 @@ def execute_sql(
       - params: Optional parameters for the query.
       - returning: If True, fetch returned rows.
       - fetch_all: If True and returning is True, fetch all rows; otherwise, fetch one row.
-      - bulk: If True, perform a bulk operation. In this case, 'params' should be a list of tuples.
+      - bulk: If True, perform a bulk operation. In this case, 'params' should be a list of tuples
+        and 'sql' should hold the placeholders for a single row.
 
     Returns:
       - If returning is False: the rowcount (number of rows affected).
       - If returning is True: the fetched result(s).
     """
     try:
-        with db.cursor() as cursor:
+        async with db.cursor() as cursor:
             if bulk:
                 # For bulk operations, params should be a list of tuples
-                execute_values(cursor, sql, params)
+                await cursor.executemany(sql, params)
             else:
-                cursor.execute(sql, params)
+                await execute(cursor, sql, params)
 
             if returning:
-                result = cursor.fetchall() if fetch_all else cursor.fetchone()
+                result = await cursor.fetchall() if fetch_all else await cursor.fetchone()
             else:
                 result = cursor.rowcount
 
-            db.commit()
+            await db.commit()
             return result
 
-    except psycopg2.Error as e:
-        # TODO :: add log here
-        db.rollback()
+    except psycopg.Error:
+        logger.exception("Query %s failed", getattr(sql, "name", "(ad-hoc)"))
+        await db.rollback()
         raise
@@ -0,0 +1,43 @@
+"""
+Query instrumentation
+
+Every cursor of a pooled connection is an InstrumentedCursor, so the queries
+run through app/db/helpers.py and the cursors opened directly by the query
+modules are all accounted against the request being served, and the slow
+ones are captured by app/db/slow_queries.py.
+"""
+
+import time
+import psycopg
+from app.core.metrics import record_query
+from app.db import slow_queries
+
+
+class InstrumentedCursor(psycopg.AsyncCursor):
+    """
+    Async cursor recording the duration and returned rows of each execution.
+    """
+    async def execute(self, query, params=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            record_query(elapsed, self._returned_rows())
+            slow_queries.capture(query, params, elapsed)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().executemany(query, params_seq, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            record_query(elapsed, self._returned_rows())
+            # Too costly to replay: logged and buffered, never explained
+            slow_queries.capture(query, None, elapsed, explain=False)
+
+    def _returned_rows(self) -> int:
+        # Statements without a result set (plain INSERT/UPDATE/DDL) return no rows
+        if self.pgresult is None or self.description is None:
+            return 0
+        return max(self.rowcount, 0)
@@ -0,0 +1,195 @@
+"""
+Versioned schema migrations
+
+Migrations are the SQL files in the migrations directory, named
+NNNN_description.sql and applied in version order. Applied versions are
+recorded in the schema_migrations table, so running the migrator again only
+applies the new ones.
+
+A migration runs in a single transaction, together with its bookkeeping,
+unless its first line is the marker below. Such migrations run statement by
+statement in autocommit mode, which CREATE INDEX CONCURRENTLY requires. Their
+statements are split on the semicolons that end a line, outside of $$ quoted
+bodies, and each statement should be safe to re-run in case the migration is
+interrupted midway: use CREATE INDEX CONCURRENTLY IF NOT EXISTS. A build
+interrupted midway leaves an INVALID index behind, which IF NOT EXISTS would
+keep, so before running such a migration the migrator drops the invalid
+indexes it builds.
+
+Usage:
+    python -m app.db.migrate [--list] [--target VERSION] [--dir PATH]
+"""
+
+import argparse
+import re
+from dataclasses import dataclass
+from pathlib import Path
+import psycopg
+from psycopg import sql
+from app.db.connection import get_conninfo
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "migrations"
+NO_TRANSACTION_MARKER = "-- migrate:no-transaction"
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d+)_(\w+)\.sql$")
+CONCURRENT_INDEX_PATTERN = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.IGNORECASE)
+
+# Serializes concurrent migrators (e.g. several app instances deploying at once)
+ADVISORY_LOCK_KEY = "library_api.schema_migrations"
+
+
+@dataclass
+class Migration:
+    """
+    A migration file.
+    """
+    version: int
+    name: str
+    path: Path
+
+    @property
+    def sql(self) -> str:
+        return self.path.read_text()
+
+    @property
+    def transactional(self) -> bool:
+        return not self.sql.lstrip().startswith(NO_TRANSACTION_MARKER)
+
+    def statements(self) -> list[str]:
+        """
+        The statements of the migration, without comment-only chunks.
+        """
+        chunks = []
+        pending = ""
+        for chunk in re.split(r";[ \t]*$", self.sql, flags=re.MULTILINE):
+            pending += chunk
+            # An odd number of $$ means the split fell inside a quoted body
+            if pending.count("$$") % 2:
+                pending += ";"
+                continue
+            chunks.append(pending)
+            pending = ""
+        chunks.append(pending)
+        statements = []
+        for chunk in chunks:
+            code = "\n".join(
+                line for line in chunk.splitlines() if not line.strip().startswith("--")
+            ).strip()
+            if code:
+                statements.append(code)
+        return statements
+
+    def concurrent_indexes(self) -> list[str]:
+        """
+        The names of the indexes the migration builds concurrently.
+        """
+        return CONCURRENT_INDEX_PATTERN.findall(self.sql)
+
+
+def discover_migrations(directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    """
+    The migrations found in the directory, in version order.
+    """
+    migrations = []
+    for path in directory.glob("*.sql"):
+        match = MIGRATION_FILE_PATTERN.match(path.name)
+        if not match:
+            raise ValueError(f"Invalid migration file name: {path.name}")
+        migrations.append(Migration(int(match.group(1)), match.group(2), path))
+    migrations.sort(key=lambda migration: migration.version)
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Duplicate migration versions found.")
+    return migrations
+
+
+def ensure_migrations_table(conn: psycopg.Connection):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    """)
+
+
+def applied_versions(conn: psycopg.Connection) -> set[int]:
+    return {row[0] for row in conn.execute("SELECT version FROM schema_migrations;")}
+
+
+def drop_invalid_indexes(conn: psycopg.Connection, names: list[str]):
+    """
+    Drop the indexes among names left INVALID by an interrupted concurrent
+    build, so that they are built again. Valid indexes are left in place.
+    """
+    for name in names:
+        row = conn.execute(
+            "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s);", (name,)
+        ).fetchone()
+        if row is not None and not row[0]:
+            print(f"Dropping invalid index {name}", flush=True)
+            conn.execute(sql.SQL("DROP INDEX CONCURRENTLY {};").format(sql.Identifier(name)))
+
+
+def apply_migration(conn: psycopg.Connection, migration: Migration):
+    """
+    Apply a single migration and record it. conn must be in autocommit mode.
+    """
+    record_sql = "INSERT INTO schema_migrations (version, name) VALUES (%s, %s);"
+    if migration.transactional:
+        with conn.transaction():
+            conn.execute(migration.sql)
+            conn.execute(record_sql, (migration.version, migration.name))
+    else:
+        drop_invalid_indexes(conn, migration.concurrent_indexes())
+        for statement in migration.statements():
+            conn.execute(statement)
+        conn.execute(record_sql, (migration.version, migration.name))
+
+
+def migrate(conninfo: str, directory: Path = MIGRATIONS_DIR, target: int | None = None) -> list[Migration]:
+    """
+    Apply the pending migrations up to target (all when None).
+    Returns the applied migrations.
+    """
+    migrations = discover_migrations(directory)
+    applied = []
+    with psycopg.connect(conninfo, autocommit=True) as conn:
+        conn.execute("SELECT pg_advisory_lock(hashtext(%s));", (ADVISORY_LOCK_KEY,))
+        try:
+            ensure_migrations_table(conn)
+            done = applied_versions(conn)
+            for migration in migrations:
+                if migration.version in done or (target is not None and migration.version > target):
+                    continue
+                print(f"Applying {migration.path.name}", flush=True)
+                apply_migration(conn, migration)
+                applied.append(migration)
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(hashtext(%s));", (ADVISORY_LOCK_KEY,))
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply the pending schema migrations.")
+    parser.add_argument("--list", action="store_true", help="show the migrations and their status")
+    parser.add_argument("--target", type=int, help="stop after this version")
+    parser.add_argument("--dir", type=Path, default=MIGRATIONS_DIR, help="migrations directory")
+    args = parser.parse_args()
+
+    conninfo = get_conninfo()
+    if args.list:
+        with psycopg.connect(conninfo, autocommit=True) as conn:
+            ensure_migrations_table(conn)
+            done = applied_versions(conn)
+        for migration in discover_migrations(args.dir):
+            status = "applied" if migration.version in done else "pending"
+            print(f"{migration.version:04d} {migration.name:<40} {status}")
+        return
+
+    applied = migrate(conninfo, args.dir, args.target)
+    print(f"Applied {len(applied)} migration(s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,19 +3,24 @@ Query wrappers for Authors entity.
 """
 
 
-import psycopg2
+import psycopg
 from app.db.helpers import \
-    execute_sql_fetch_all, execute_sql_fetch_one
+    count_rows, execute, execute_sql_fetch_all, execute_sql_fetch_one, stream_copy_out, stream_text_rows
+from app.db.statements import statement
 from app.core import exceptions as custom_exceptions
+from app.core.constants import ExportFormat
 from app.models import authors as authors_models
 
-def get_all_authors_query(db, offset, limit):
+async def get_all_authors_query(db, offset, limit, after=None):
     """
     Return all Authors.
+    Authors are ordered by id; 'after' holds the keyset of the last row
+    of the previous page.
     """
     try:
-        sql = \
-        """
+        keyset_clause = "WHERE id > %(after_id)s" if after else ""
+        variant = "after" if after else "first"
+        sql = statement(f"authors.list[{variant}]", f"""
         SELECT
             id,
             first_name,
@@ -23,47 +28,125 @@ def get_all_authors_query(db, offset, limit):
             date_of_birth
         FROM
             Authors
+        {keyset_clause}
+        ORDER BY id
         OFFSET %(offset)s LIMIT %(limit)s;
-        """
-        params = {'offset': offset, 'limit': limit}
-        all_authors = execute_sql_fetch_all(db, sql, params)
+        """)
+        params = {
+            'offset': offset,
+            'limit': limit,
+            'after_id': after["id"] if after else None
+        }
+        all_authors = await execute_sql_fetch_all(db, sql, params)
         return all_authors
-    except psycopg2.Error as e:
-        db.rollback()
+    except psycopg.Error as e:
+        await db.rollback()
         raise custom_exceptions.DatabaseOperationException(
             "Failed to fetch authors."
         )
 
 
-def get_author(db, author_id):
+async def count_authors_query(db, exact_limit):
+    """
+    Count the Authors, exactly for small tables and from the planner's
+    estimate for large ones.
+    Returns the total and whether it is an estimate.
+    """
+    try:
+        return await count_rows(db, "authors.count", "FROM authors", exact_limit=exact_limit)
+    except psycopg.Error as e:
+        await db.rollback()
+        raise custom_exceptions.DatabaseOperationException(
+            "Failed to count Authors."
+        )
+
+
+async def get_author(db, author_id):
     """
     Fetch the Author matching the given author_id.
     """
     try:
-        sql = \
-        """
+        sql = statement("authors.get", """
         SELECT
             id,
             first_name,
             last_name,
-            date_of_birth
+            date_of_birth,
+            version
         FROM
             Authors
         Where id = %(author_id)s;
-        """
+        """)
         params = {'author_id': author_id}
-        author = execute_sql_fetch_one(db, sql, params)
+        author = await execute_sql_fetch_one(db, sql, params)
         if not author:
             raise custom_exceptions.RecordNotFoundException("Author not found")
         return author
-    except psycopg2.Error as e:
-        db.rollback()
+    except psycopg.Error as e:
+        await db.rollback()
         raise custom_exceptions.DatabaseOperationException(
             "Failed to fetch the Author."
         )
 
 
-def add_new_author_query(db, author) -> authors_models.Author:
+async def get_author_version(db, author_id):
+    """
+    Fetch the row version of the given Author, None if it doesn't exist.
+    """
+    try:
+        sql = statement("authors.version", """
+        SELECT version FROM authors WHERE id = %(author_id)s;
+        """)
+        row = await execute_sql_fetch_one(db, sql, {'author_id': author_id})
+        return row["version"] if row else None
+    except psycopg.Error as e:
+        await db.rollback()
+        raise custom_exceptions.DatabaseOperationException(
+            "Failed to fetch the Author."
+        )
+
+
+async def get_books_by_author_ids(db, author_ids, books_limit) -> dict[int, list]:
+    """
+    Batch load the books of the given authors with a single query,
+    at most books_limit per author, ordered by title.
+    Returns the books list of each author, keyed by author id.
+    """
+    if not author_ids:
+        return {}
+    try:
+        # The lateral subquery walks idx_book_authors_author_id once per author
+        sql = statement("authors.books_by_author_ids", """
+        SELECT
+            a.author_id,
+            b.id,
+            b.title,
+            b.isbn,
+            b.genre,
+            b.publication_date
+        FROM unnest(%(author_ids)s::integer[]) AS a(author_id)
+        CROSS JOIN LATERAL (
+            SELECT bk.id, bk.title, bk.isbn, bk.genre, bk.publication_date
+            FROM book_authors ba
+            JOIN books bk ON bk.id = ba.book_id
+            WHERE ba.author_id = a.author_id
+            ORDER BY bk.title, bk.id
+            LIMIT %(books_limit)s
+        ) b;
+        """)
+        params = {"author_ids": list(author_ids), "books_limit": books_limit}
+        books_by_author = {}
+        for book in await execute_sql_fetch_all(db, sql, params):
+            books_by_author.setdefault(book.pop("author_id"), []).append(book)
+        return books_by_author
+    except psycopg.Error as e:
+        await db.rollback()
+        raise custom_exceptions.DatabaseOperationException(
+            "Failed to fetch the books of the authors."
+        )
+
+
+async def add_new_author_query(db, author) -> authors_models.Author:
     """
     Add a new author record to the database.
     """
@@ -74,16 +157,16 @@ def add_new_author_query(db, author) -> authors_models.Author:
             'date_of_birth': author.date_of_birth
         }
 
-        sql = """
+        sql = statement("authors.insert", """
         INSERT INTO authors (first_name, last_name, date_of_birth)
         VALUES (%(first_name)s, %(last_name)s, %(date_of_birth)s)
         RETURNING id, first_name, last_name, date_of_birth;
-        """
+        """)
 
-        with db.cursor() as cursor:
-            cursor.execute(sql, params)
-            author_id, first_name, last_name, date_of_birth = cursor.fetchone()
-            db.commit()
+        async with db.cursor() as cursor:
+            await execute(cursor, sql, params)
+            author_id, first_name, last_name, date_of_birth = await cursor.fetchone()
+            await db.commit()
 
             return authors_models.Author(
                 id=author_id,
@@ -92,19 +175,19 @@ def add_new_author_query(db, author) -> authors_models.Author:
                 date_of_birth=date_of_birth
             )
 
-    except psycopg2.Error as e:
-        db.rollback()
+    except psycopg.Error as e:
+        await db.rollback()
         raise custom_exceptions.DatabaseOperationException(
             "Failed to add author to the library."
         )
 
 
-def update_author_query(db, author_id, update_data):
+async def update_author_query(db, author_id, update_data):
     """
     Update an existing author in the database.
     """
     try:
-        with db.cursor() as cursor:
+        async with db.cursor() as cursor:
             # Prepare the UPDATE statement
             set_clauses = []
             params = {"author_id": author_id}
@@ -115,27 +198,86 @@ def update_author_query(db, author_id, update_data):
 
             author_updated = None
             if set_clauses:
-                sql = f"""
+                # One registered statement per combination of updated columns
+                sql = statement(f"authors.update[{','.join(update_data)}]", f"""
                 UPDATE authors
                 SET {', '.join(set_clauses)}
                 WHERE id = %(author_id)s
                 RETURNING id, first_name, last_name, date_of_birth;
-                """
-                cursor.execute(sql, params)
-                author_updated = cursor.fetchone()
+                """)
+                await execute(cursor, sql, params)
+                author_updated = await cursor.fetchone()
 
             if not author_updated:
                 raise custom_exceptions.RecordNotFoundException("The author with the given ID does not exist.")
 
-        db.commit()
+        await db.commit()
         return authors_models.Author(
             id=author_updated[0],
             first_name=author_updated[1],
             last_name=author_updated[2],
             date_of_birth = author_updated[3]
         )
-    except psycopg2.Error as e:
-        db.rollback()
+    except psycopg.Error as e:
+        await db.rollback()
         raise custom_exceptions.DatabaseOperationException(
             "Failed to update the author."
         )
+
+
+async def bulk_import_authors_query(db, authors) -> int:
+    """
+    Bulk load authors with COPY.
+    'authors' is an async iterator of (row number, AuthorCreate).
+    Returns the number of imported authors.
+    """
+    try:
+        imported = 0
+        async with db.cursor() as cursor:
+            copy_sql = "COPY authors (first_name, last_name, date_of_birth) FROM STDIN"
+            async with cursor.copy(copy_sql) as copy:
+                async for _, author in authors:
+                    await copy.write_row((author.first_name, author.last_name, author.date_of_birth))
+                    imported += 1
+
+        await db.commit()
+        return imported
+
+    except psycopg.Error as e:
+        await db.rollback()
+        raise custom_exceptions.DatabaseOperationException(
+            "Failed to import the authors."
+        )
+
+
+async def export_authors_query(db, export_format: ExportFormat):
+    """
+    Stream all authors as NDJSON or CSV byte chunks.
+    """
+    if export_format == ExportFormat.CSV:
+        sql = """
+        COPY (
+            SELECT id, first_name, last_name, date_of_birth
+            FROM authors
+            ORDER BY id
+        ) TO STDOUT WITH (FORMAT csv, HEADER);
+        """
+        chunks = stream_copy_out(db, sql)
+    else:
+        sql = """
+        SELECT row_to_json(author)::text
+        FROM (
+            SELECT id, first_name, last_name, date_of_birth
+            FROM authors
+            ORDER BY id
+        ) AS author;
+        """
+        chunks = stream_text_rows(db, sql)
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except psycopg.Error as e:
+        await db.rollback()
+        raise custom_exceptions.DatabaseOperationException(
+            "Failed to export authors."
+        )
@@ -2,139 +2,235 @@
 Query wrappers for Books entity.
 """
 
-import psycopg2
-from psycopg2.extras import execute_values
+import psycopg
 from app.db.helpers import \
-    execute_sql_fetch_all, execute_sql_fetch_one
+    count_rows, execute, execute_sql_fetch_all, execute_sql_fetch_one, stream_copy_out, stream_text_rows
+from app.db.statements import statement
 from app.models import books as books_models
 from app.core import exceptions as custom_exceptions
+from app.core.constants import ExportFormat
 
 
-def get_all_books_query(db, filters, offset, limit):
+# Shorter terms yield no trigram, so pg_trgm can neither index nor score them.
+TRGM_MIN_TERM_LENGTH = 3
+
+
+def use_trigram_similarity(filters, term):
     """
-    Obtain all books with optional filtering.
+    Whether a fuzzy search term is long enough for trigram similarity.
     """
-    try:
-        # Prepare the WHERE clause for filtering.
-        where_clauses = []
-        filter_params = {}
-        if filters.title:
+    return filters.fuzzy and len(term) >= TRGM_MIN_TERM_LENGTH
+
+
+def plan_book_filters(filters):
+    """
+    Translate BookFilters into predicates the search indexes can serve.
+
+    Returns the WHERE clauses, their params, the relevance expression
+    (None when no filter produces a meaningful rank) and the names of the
+    chosen predicates, which identify the resulting SQL variant.
+    """
+    where_clauses = []
+    filter_params = {}
+    rank_terms = []
+    predicates = []
+
+    if filters.q:
+        # Full-text search over title and genre, served by idx_books_search_vector
+        where_clauses.append("b.search_vector @@ websearch_to_tsquery('english', %(q)s)")
+        filter_params["q"] = filters.q
+        predicates.append("q")
+        rank_terms.append("ts_rank_cd(b.search_vector, websearch_to_tsquery('english', %(q)s))")
+    if filters.title:
+        if use_trigram_similarity(filters, filters.title):
+            # Typo tolerant word similarity, served by idx_books_title_trgm
+            where_clauses.append("%(title)s <%% b.title")
+            filter_params["title"] = filters.title
+            rank_terms.append("word_similarity(%(title)s, b.title)")
+            predicates.append("title:fuzzy")
+        else:
+            # Served by idx_books_title_trgm for terms of TRGM_MIN_TERM_LENGTH or more
             where_clauses.append("b.title ILIKE %(title)s")
             filter_params["title"] = f"%{filters.title}%"
-        if filters.genre:
-            where_clauses.append("b.genre ILIKE %(genre)s")
-            filter_params["genre"] = f"%{filters.genre}%"
-        if filters.isbn:
-            where_clauses.append("b.isbn ILIKE %(isbn)s")
-            filter_params["isbn"] = f"%{filters.isbn}%"
-        if filters.author:
-            where_clauses.append("""
-                EXISTS (
-                    SELECT 1 FROM authors a2 
-                    JOIN book_authors ba2 ON b.id = ba2.book_id 
-                    WHERE a2.id = ba2.author_id 
-                    AND (a2.first_name ILIKE %(author)s OR a2.last_name ILIKE %(author)s)
-                )
-            """)
+            predicates.append("title")
+    if filters.genre:
+        # Served by idx_books_genre_trgm
+        where_clauses.append("b.genre ILIKE %(genre)s")
+        filter_params["genre"] = f"%{filters.genre}%"
+        predicates.append("genre")
+    if filters.isbn:
+        # ISBN is validated and normalised to ISBN-13, so a substring match is an exact match
+        where_clauses.append("b.isbn = %(isbn)s")
+        filter_params["isbn"] = str(filters.isbn)
+        predicates.append("isbn")
+    if filters.author:
+        # Resolve matching authors first through their trigram indexes, then
+        # their books through idx_book_authors_author_id, instead of probing
+        # the authors of every candidate book.
+        if use_trigram_similarity(filters, filters.author):
+            author_match = "(%(author)s <%% a2.first_name OR %(author)s <%% a2.last_name)"
+            filter_params["author"] = filters.author
+            predicates.append("author:fuzzy")
+        else:
+            author_match = "(a2.first_name ILIKE %(author)s OR a2.last_name ILIKE %(author)s)"
             filter_params["author"] = f"%{filters.author}%"
+            predicates.append("author")
+        where_clauses.append(f"""
+            b.id IN (
+                SELECT ba2.book_id FROM authors a2
+                JOIN book_authors ba2 ON a2.id = ba2.author_id
+                WHERE {author_match}
+            )
+        """)
+
+    rank_expression = " + ".join(rank_terms) if rank_terms else None
+    return where_clauses, filter_params, rank_expression, predicates
+
+
+async def get_all_books_query(db, filters, offset, limit, after=None,
+                              sort=books_models.BookSort.TITLE):
+    """
+    Obtain all books with optional filtering.
+    Books are ordered by (title, id); 'after' holds the keyset of the
+    last row of the previous page. With sort=relevance, books are ranked
+    by how well they match the search filters instead.
+    """
+    try:
+        # Prepare the WHERE clause for filtering.
+        where_clauses, filter_params, rank_expression, predicates = plan_book_filters(filters)
+        if after:
+            where_clauses.append("(b.title, b.id) > (%(after_title)s, %(after_id)s)")
+            filter_params["after_title"] = after["title"]
+            filter_params["after_id"] = after["id"]
+            predicates.append("after")
+
+        if sort == books_models.BookSort.RELEVANCE and rank_expression:
+            order_by = f"{rank_expression} DESC, b.id"
+            predicates.append("by_relevance")
+        else:
+            order_by = "b.title, b.id"
 
         where_clause = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
 
         params = {"limit": limit, "offset": offset}
         params.update(filter_params)
 
-        # Prepare the main query.
-        sql = f"""
-            SELECT * FROM (
-                SELECT 
-                    b.id, 
-                    b.title, 
-                    b.isbn, 
-                    b.genre, 
-                    b.publication_date, 
-                    COALESCE(
-                        json_agg(
-                            DISTINCT jsonb_build_object(
-                                'id', a.id, 
-                                'first_name', a.first_name, 
-                                'last_name', a.last_name
-                            )
-                        ) FILTER (WHERE a.id IS NOT NULL), 
-                        '[]'::json
-                    ) AS authors
-                FROM books b
-                LEFT JOIN book_authors ba ON b.id = ba.book_id
-                LEFT JOIN authors a ON ba.author_id = a.id
-                {where_clause}
-                GROUP BY b.id
-                ORDER BY b.title
-            ) AS sub
+        # Registered once per filter combination. The authors are
+        # denormalized onto books.authors, so the page is a single query.
+        sql = statement(f"books.list[{','.join(predicates)}]", f"""
+            SELECT
+                b.id,
+                b.title,
+                b.isbn,
+                b.genre,
+                b.publication_date,
+                b.available_copies,
+                b.authors
+            FROM books b
+            {where_clause}
+            ORDER BY {order_by}
             LIMIT %(limit)s OFFSET %(offset)s;
-        """
-        all_books = execute_sql_fetch_all(db, sql, params)
-        return all_books
-    except psycopg2.Error as e:
-        db.rollback()
+        """)
+        return await execute_sql_fetch_all(db, sql, params)
+    except psycopg.Error as e:
+        await db.rollback()
         raise custom_exceptions.DatabaseOperationException(
             "Failed to fetch books."
         )
 
 
-def get_book(db, book_id):
+async def count_books_query(db, filters, exact_limit):
+    """
+    Count the books matching the filters, exactly for narrow filters and
+    from the planner's estimate for broad ones.
+    Returns the total and whether it is an estimate.
+    """
+    try:
+        where_clauses, filter_params, _, predicates = plan_book_filters(filters)
+        where_clause = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
+        return await count_rows(
+            db, f"books.count[{','.join(predicates)}]", f"FROM books b {where_clause}", filter_params,
+            exact_limit=exact_limit
+        )
+    except psycopg.Error as e:
+        await db.rollback()
+        raise custom_exceptions.DatabaseOperationException(
+            "Failed to count books."
+        )
+
+
+async def get_book(db, book_id):
     """
     Fetch the book matching the given id
     """
     try:
-        sql = \
-        """
-        SELECT 
-            b.id, 
-            b.title, 
-            b.isbn, 
-            b.genre, 
+        sql = statement("books.get", """
+        SELECT
+            b.id,
+            b.title,
+            b.isbn,
+            b.genre,
             b.publication_date,
             b.available_copies,
-            COALESCE(
-                json_agg(
-                    DISTINCT jsonb_build_object(
-                        'id', a.id, 
-                        'first_name', a.first_name, 
-                        'last_name', a.last_name
-                    )
-                ) FILTER (WHERE a.id IS NOT NULL), 
-                '[]'::json
-            ) AS authors
+            b.authors,
+            b.version
         FROM books b
-        LEFT JOIN book_authors ba ON b.id = ba.book_id
-        LEFT JOIN authors a ON ba.author_id = a.id
-        WHERE b.id = %(book_id)s
-        GROUP BY b.id;
-        """
+        WHERE b.id = %(book_id)s;
+        """)
         params = {'book_id': book_id}
-        book = execute_sql_fetch_one(db, sql, params)
+        book = await execute_sql_fetch_one(db, sql, params)
         if not book:
             raise custom_exceptions.RecordNotFoundException("Books not found")
         return book
-    except psycopg2.Error as e:
-        db.rollback()
+    except psycopg.Error as e:
+        await db.rollback()
+        raise custom_exceptions.DatabaseOperationException(
+            "Failed to fetch the book."
+        )
+
+
+async def get_book_version(db, book_id):
+    """
+    Fetch the row version of the given book, None if it doesn't exist
+    """
+    try:
+        sql = statement("books.version", """
+        SELECT version FROM books WHERE id = %(book_id)s;
+        """)
+        row = await execute_sql_fetch_one(db, sql, {'book_id': book_id})
+        return row["version"] if row else None
+    except psycopg.Error as e:
+        await db.rollback()
         raise custom_exceptions.DatabaseOperationException(
             "Failed to fetch the book."
         )
 
 
-def add_new_book(db, book: books_models.BookCreate) -> int:
+async def link_book_authors(cursor, book_id, author_ids):
+    """
+    Link a book to its authors in a single statement, so that the
+    denormalized books.authors is refreshed once rather than per author.
+    """
+    sql = statement("books.link_authors", """
+    INSERT INTO book_authors (book_id, author_id)
+    SELECT %(book_id)s, unnest(%(author_ids)s::integer[]);
+    """)
+    await execute(cursor, sql, {"book_id": book_id, "author_ids": author_ids})
+
+
+async def add_new_book(db, book: books_models.BookCreate) -> int:
     """
     Add a new book record to the database and link it to the provided authors.
     Returns the newly created book's ID.
     """
     try:
-        with db.cursor() as cursor:
+        async with db.cursor() as cursor:
             # Insert the book into the books table
-            book_sql = """
+            book_sql = statement("books.insert", """
             INSERT INTO books (title, isbn, genre, publication_date, available_copies)
             VALUES (%(title)s, %(isbn)s, %(genre)s, %(publication_date)s, %(available_copies)s)
             RETURNING id;
-            """
+            """)
             params = {
                 'title': book.title,
                 'isbn': book.isbn,
@@ -142,49 +238,40 @@ def add_new_book(db, book: books_models.BookCreate) -> int:
                 'publication_date': book.publication_date,
                 'available_copies': book.available_copies,
             }
-            cursor.execute(book_sql, params)
-            new_book_id_row = cursor.fetchone()
+            await execute(cursor, book_sql, params)
+            new_book_id_row = await cursor.fetchone()
             new_book_id = new_book_id_row[0]
 
             # Link the new book with each provided author via book_authors table
-            link_sql = """
-            INSERT INTO book_authors (book_id, author_id)
-            VALUES (%(book_id)s, %(author_id)s);
-            """
-            for author_id in book.author_ids:
-                link_params = {
-                    'book_id': new_book_id,
-                    'author_id': author_id,
-                }
-                cursor.execute(link_sql, link_params)
+            await link_book_authors(cursor, new_book_id, book.author_ids)
 
         # Commit the transaction only if all the previous operations succeed
-        db.commit()
+        await db.commit()
         return new_book_id
 
-    except psycopg2.errors.UniqueViolation as e:
-        db.rollback()
+    except psycopg.errors.UniqueViolation as e:
+        await db.rollback()
         raise custom_exceptions.DuplicateEntryException(
             "A book with the given ISBN already exists."
         )
-    except psycopg2.errors.ForeignKeyViolation as e:
-        db.rollback()
+    except psycopg.errors.ForeignKeyViolation as e:
+        await db.rollback()
         raise custom_exceptions.ForeignKeyNotFoundException(
             "The specified author was not found. Please check the author ID and try again."
         )
-    except psycopg2.Error as e:
-        db.rollback()
+    except psycopg.Error as e:
+        await db.rollback()
         raise custom_exceptions.DatabaseOperationException(
             "Failed to add the book to the library."
         )
 
 
-def update_book(db, book_id, update_data):
+async def update_book(db, book_id, update_data):
     """
     Update a book record and its associated authors.
     """
     try:
-        with db.cursor() as cursor:
+        async with db.cursor() as cursor:
             # Prepare the UPDATE statement for book fields (excluding 'author_ids')
             set_clauses = []
             params = {}
@@ -196,14 +283,16 @@ def update_book(db, book_id, update_data):
 
             book_updated = False
             if set_clauses:
-                sql_update = f"""
+                # One registered statement per combination of updated columns
+                columns = ','.join(key for key in update_data if key != "author_ids")
+                sql_update = statement(f"books.update[{columns}]", f"""
                 UPDATE books
                 SET {', '.join(set_clauses)}
                 WHERE id = %(book_id)s
                 RETURNING id;
-                """
-                cursor.execute(sql_update, params)
-                book_updated = cursor.fetchone()
+                """)
+                await execute(cursor, sql_update, params)
+                book_updated = await cursor.fetchone()
 
             if not book_updated:
                 raise custom_exceptions.RecordNotFoundException("The book with the given ID does not exist.")
@@ -212,51 +301,213 @@ def update_book(db, book_id, update_data):
             if "author_ids" in update_data:
                 new_author_ids = update_data["author_ids"]
                 # Delete existing associations
-                cursor.execute("DELETE FROM book_authors WHERE book_id = %(book_id)s;",
-                               {"book_id": book_id})
-                # Bulk insert new associations
-                bulk_sql = "INSERT INTO book_authors (book_id, author_id) VALUES %s;"
-                values = [(book_id, author_id) for author_id in new_author_ids]
-                execute_values(cursor, bulk_sql, values)
+                sql_unlink = statement("books.unlink_authors", """
+                DELETE FROM book_authors WHERE book_id = %(book_id)s;
+                """)
+                await execute(cursor, sql_unlink, {"book_id": book_id})
+                # Insert the new associations
+                await link_book_authors(cursor, book_id, new_author_ids)
         
         # Commit transaction if all operations succeed
-        db.commit()
+        await db.commit()
         return book_id
-    except psycopg2.errors.UniqueViolation as e:
-        db.rollback()
+    except psycopg.errors.UniqueViolation as e:
+        await db.rollback()
         raise custom_exceptions.DuplicateEntryException(
             "A book with the given ISBN already exists."
         )
-    except psycopg2.errors.ForeignKeyViolation as e:
-        db.rollback()
+    except psycopg.errors.ForeignKeyViolation as e:
+        await db.rollback()
         raise custom_exceptions.ForeignKeyNotFoundException(
             "The specified author was not found. Please check the author ID and try again."
         )
-    except psycopg2.Error as e:
-        db.rollback()
+    except psycopg.Error as e:
+        await db.rollback()
         raise custom_exceptions.DatabaseOperationException(
             "Failed to update the book."
         )
 
 
 # NOTE :: Fix the deletion logic
-def delete_book(db, book_id: int) -> int:
+async def delete_book(db, book_id: int) -> int:
     """
     Delete a book and its associations from the database.
     """
     try:
-        with db.cursor() as cursor:
+        async with db.cursor() as cursor:
             # Delete associations in book_authors table
-            cursor.execute("DELETE FROM book_authors WHERE book_id = %(book_id)s", {"book_id": book_id})
+            sql_unlink = statement("books.unlink_authors", """
+            DELETE FROM book_authors WHERE book_id = %(book_id)s;
+            """)
+            await execute(cursor, sql_unlink, {"book_id": book_id})
 
             # Delete the book from the books table
-            cursor.execute("DELETE FROM books WHERE id = %(book_id)s", {"book_id": book_id})
+            sql_delete = statement("books.delete", """
+            DELETE FROM books WHERE id = %(book_id)s;
+            """)
+            await execute(cursor, sql_delete, {"book_id": book_id})
 
-        db.commit()
+        await db.commit()
         return True
-    except psycopg2.errors.ForeignKeyViolation as e:
-        db.rollback()
+    except psycopg.errors.ForeignKeyViolation as e:
+        await db.rollback()
         raise custom_exceptions.LoanPendingException("Cannot delete book as it is currently loaned.")
-    except psycopg2.Error as e:
-        db.rollback()
+    except psycopg.Error as e:
+        await db.rollback()
         raise
+
+
+async def bulk_import_books_query(db, books, report) -> int:
+    """
+    Bulk load books with COPY through a staging table.
+
+    'books' is an async iterator of (row number, BookCreate). Rows with a
+    duplicate ISBN or an unknown author are recorded in the report instead
+    of aborting the batch. Returns the number of imported books.
+    """
+    try:
+        async with db.cursor() as cursor:
+            await cursor.execute("""
+            CREATE TEMP TABLE book_import (
+                row_num INTEGER PRIMARY KEY,
+                title VARCHAR(255),
+                isbn VARCHAR(13),
+                genre VARCHAR(255),
+                publication_date DATE,
+                available_copies INTEGER,
+                author_ids INTEGER[],
+                book_id INTEGER,
+                error TEXT
+            ) ON COMMIT DROP;
+            """)
+
+            copy_sql = """
+            COPY book_import (row_num, title, isbn, genre, publication_date, available_copies, author_ids)
+            FROM STDIN
+            """
+            async with cursor.copy(copy_sql) as copy:
+                async for row_num, book in books:
+                    await copy.write_row((
+                        row_num, book.title, str(book.isbn), book.genre,
+                        book.publication_date, book.available_copies, book.author_ids
+                    ))
+            await cursor.execute("ANALYZE book_import;")
+
+            # Reject repeated ISBNs within the batch, keeping the first occurrence
+            await cursor.execute("""
+            UPDATE book_import i
+            SET error = 'Duplicate ISBN within the import.'
+            FROM (
+                SELECT row_num, row_number() OVER (PARTITION BY isbn ORDER BY row_num) AS occurrence
+                FROM book_import
+            ) d
+            WHERE d.row_num = i.row_num AND d.occurrence > 1;
+            """)
+            # Reject ISBNs already in the catalog
+            await cursor.execute("""
+            UPDATE book_import i
+            SET error = 'A book with the given ISBN already exists.'
+            FROM books b
+            WHERE b.isbn = i.isbn AND i.error IS NULL;
+            """)
+            # Reject rows linking to unknown authors
+            await cursor.execute("""
+            UPDATE book_import i
+            SET error = 'Author not found: ' || m.missing_ids || '.'
+            FROM (
+                SELECT s.row_num, string_agg(DISTINCT x.author_id::text, ', ') AS missing_ids
+                FROM book_import s
+                CROSS JOIN LATERAL unnest(s.author_ids) AS x(author_id)
+                LEFT JOIN authors a ON a.id = x.author_id
+                WHERE a.id IS NULL
+                GROUP BY s.row_num
+            ) m
+            WHERE m.row_num = i.row_num AND i.error IS NULL;
+            """)
+
+            # Insert the accepted books and link their authors in one statement
+            await cursor.execute("""
+            WITH inserted AS (
+                INSERT INTO books (title, isbn, genre, publication_date, available_copies)
+                SELECT title, isbn, genre, publication_date, available_copies
+                FROM book_import
+                WHERE error IS NULL
+                ORDER BY row_num
+                ON CONFLICT (isbn) DO NOTHING
+                RETURNING id, isbn
+            ), linked AS (
+                INSERT INTO book_authors (book_id, author_id)
+                SELECT DISTINCT ins.id, x.author_id
+                FROM inserted ins
+                JOIN book_import i ON i.isbn = ins.isbn AND i.error IS NULL
+                CROSS JOIN LATERAL unnest(i.author_ids) AS x(author_id)
+            )
+            UPDATE book_import i
+            SET book_id = ins.id
+            FROM inserted ins
+            WHERE i.isbn = ins.isbn AND i.error IS NULL;
+            """)
+            imported = cursor.rowcount
+
+            # Rows that lost an ISBN race with a concurrent writer are left without a book_id
+            await cursor.execute("""
+            SELECT row_num, COALESCE(error, 'A book with the given ISBN already exists.')
+            FROM book_import
+            WHERE error IS NOT NULL OR book_id IS NULL;
+            """)
+            for row_num, error in await cursor.fetchall():
+                report.add_error(row_num, error)
+
+        await db.commit()
+        return imported
+
+    except psycopg.Error as e:
+        await db.rollback()
+        raise custom_exceptions.DatabaseOperationException(
+            "Failed to import the books."
+        )
+
+
+# Streams in primary key order, straight off the books table
+BOOKS_EXPORT_COLUMNS_SQL = """
+    b.id,
+    b.title,
+    b.isbn,
+    b.genre,
+    b.publication_date,
+    b.available_copies,
+    b.authors
+"""
+
+
+async def export_books_query(db, export_format: ExportFormat):
+    """
+    Stream the whole catalog as NDJSON or CSV byte chunks.
+    """
+    if export_format == ExportFormat.CSV:
+        sql = f"""
+        COPY (
+            SELECT {BOOKS_EXPORT_COLUMNS_SQL}
+            FROM books b
+            ORDER BY b.id
+        ) TO STDOUT WITH (FORMAT csv, HEADER);
+        """
+        chunks = stream_copy_out(db, sql)
+    else:
+        sql = f"""
+        SELECT row_to_json(book)::text
+        FROM (
+            SELECT {BOOKS_EXPORT_COLUMNS_SQL}
+            FROM books b
+            ORDER BY b.id
+        ) AS book;
+        """
+        chunks = stream_text_rows(db, sql)
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except psycopg.Error as e:
+        await db.rollback()
+        raise custom_exceptions.DatabaseOperationException(
+            "Failed to export books."
+        )
@@ -0,0 +1,141 @@
+"""
+Query wrappers for Loans entity.
+"""
+
+import psycopg
+from app.db.helpers import execute_sql_fetch_all, stream_copy_out, stream_text_rows
+from app.db.statements import statement
+from app.core import exceptions as custom_exceptions
+from app.core.constants import ExportFormat
+
+
+def plan_overdue_filters(filters):
+    """
+    Translate OverdueLoanFilters into the WHERE clauses of the overdue queries.
+
+    Returns the WHERE clause, its params and the names of the chosen
+    predicates, which identify the resulting SQL variant.
+    """
+    # Active loans by due date, served by the partial idx_loans_active_due_date
+    # whatever the number of returned loans in the table
+    where_clauses = [
+        "l.return_date IS NULL",
+        "l.due_date <= CURRENT_DATE - %(min_days_overdue)s::integer",
+    ]
+    params = {"min_days_overdue": filters.min_days_overdue}
+    predicates = []
+
+    if filters.patron_id is not None:
+        # Served by the partial idx_loans_active_patron_book
+        where_clauses.append("l.patron_id = %(patron_id)s")
+        params["patron_id"] = filters.patron_id
+        predicates.append("patron")
+    if filters.book_id is not None:
+        where_clauses.append("l.book_id = %(book_id)s")
+        params["book_id"] = filters.book_id
+        predicates.append("book")
+    if filters.genre:
+        where_clauses.append("b.genre ILIKE %(genre)s")
+        params["genre"] = f"%{filters.genre}%"
+        predicates.append("genre")
+
+    return "WHERE " + " AND ".join(where_clauses), params, predicates
+
+
+OVERDUE_LOAN_COLUMNS_SQL = """
+    l.id,
+    l.patron_id,
+    l.book_id,
+    b.title,
+    b.genre,
+    l.loan_date,
+    l.due_date,
+    CURRENT_DATE - l.due_date AS days_overdue
+"""
+
+
+async def get_overdue_loans_query(db, filters, offset, limit, after=None):
+    """
+    Return the overdue loans matching the filters, most overdue first.
+    Loans are ordered by (due_date, id); 'after' holds the keyset of the
+    last row of the previous page.
+    """
+    try:
+        where_clause, params, predicates = plan_overdue_filters(filters)
+        if after:
+            where_clause += " AND (l.due_date, l.id) > (%(after_due_date)s, %(after_id)s)"
+            params["after_due_date"] = after["due_date"]
+            params["after_id"] = after["id"]
+            predicates.append("after")
+        params.update({"offset": offset, "limit": limit})
+
+        sql = statement(f"loans.overdue[{','.join(predicates)}]", f"""
+            SELECT {OVERDUE_LOAN_COLUMNS_SQL}
+            FROM loans l
+            JOIN books b ON b.id = l.book_id
+            {where_clause}
+            ORDER BY l.due_date, l.id
+            LIMIT %(limit)s OFFSET %(offset)s;
+        """)
+        return await execute_sql_fetch_all(db, sql, params)
+    except psycopg.Error:
+        await db.rollback()
+        raise custom_exceptions.DatabaseOperationException(
+            "Failed to fetch overdue loans."
+        )
+
+
+async def get_overdue_patrons_query(db, filters, offset, limit):
+    """
+    Roll the overdue loans matching the filters up per patron, in a single
+    aggregate query. Patrons with the longest overdue loan come first.
+    """
+    try:
+        where_clause, params, predicates = plan_overdue_filters(filters)
+        params.update({"offset": offset, "limit": limit})
+
+        sql = statement(f"loans.overdue_patrons[{','.join(predicates)}]", f"""
+            SELECT
+                l.patron_id,
+                count(*) AS overdue_loans,
+                min(l.due_date) AS oldest_due_date,
+                CURRENT_DATE - min(l.due_date) AS max_days_overdue
+            FROM loans l
+            JOIN books b ON b.id = l.book_id
+            {where_clause}
+            GROUP BY l.patron_id
+            ORDER BY oldest_due_date, l.patron_id
+            LIMIT %(limit)s OFFSET %(offset)s;
+        """)
+        return await execute_sql_fetch_all(db, sql, params)
+    except psycopg.Error:
+        await db.rollback()
+        raise custom_exceptions.DatabaseOperationException(
+            "Failed to fetch overdue patrons."
+        )
+
+
+async def export_overdue_loans_query(db, filters, export_format: ExportFormat):
+    """
+    Stream every overdue loan matching the filters as NDJSON or CSV byte chunks.
+    """
+    where_clause, params, _ = plan_overdue_filters(filters)
+    select_sql = f"""
+        SELECT {OVERDUE_LOAN_COLUMNS_SQL}
+        FROM loans l
+        JOIN books b ON b.id = l.book_id
+        {where_clause}
+        ORDER BY l.due_date, l.id
+    """
+    if export_format == ExportFormat.CSV:
+        chunks = stream_copy_out(db, f"COPY ({select_sql}) TO STDOUT WITH (FORMAT csv, HEADER);", params)
+    else:
+        chunks = stream_text_rows(db, f"SELECT row_to_json(loan)::text FROM ({select_sql}) AS loan;", params)
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except psycopg.Error:
+        await db.rollback()
+        raise custom_exceptions.DatabaseOperationException(
+            "Failed to export overdue loans."
+        )
@@ -3,71 +3,112 @@ Query wrappers for Authors entity.
 """
 
 
-import psycopg2
+import psycopg
 from app.db.helpers import \
-    execute_sql_fetch_all, execute_sql_fetch_one
+    count_rows, execute, execute_sql_fetch_all, execute_sql_fetch_one, stream_copy_out, stream_text_rows
+from app.db.statements import statement
 from app.core import exceptions as custom_exceptions
+from app.core.constants import ExportFormat
 from app.models import patrons as patrons_models
 from datetime import date
 
 
-def get_all_patrons_query(db, offset, limit):
+async def get_all_patrons_query(db, offset, limit, after=None):
     """
-    Return all Patrons.
+    Return all Patrons, with only the columns of the Patron model: the
+    listing may be encoded without going through it.
+    Patrons are ordered by id; 'after' holds the keyset of the last row
+    of the previous page.
     """
     try:
-        sql = \
-        """
+        keyset_clause = "WHERE id > %(after_id)s" if after else ""
+        variant = "after" if after else "first"
+        sql = statement(f"patrons.list[{variant}]", f"""
         SELECT
             id,
-            first_name,
-            last_name,
-            email,
             registration_date
         FROM
             patrons
+        {keyset_clause}
+        ORDER BY id
         OFFSET %(offset)s LIMIT %(limit)s;
-        """
-        params = {'offset': offset, 'limit': limit}
-        all_patrons = execute_sql_fetch_all(db, sql, params)
+        """)
+        params = {
+            'offset': offset,
+            'limit': limit,
+            'after_id': after["id"] if after else None
+        }
+        all_patrons = await execute_sql_fetch_all(db, sql, params)
         return all_patrons
-    except psycopg2.Error as e:
-        db.rollback()
+    except psycopg.Error as e:
+        await db.rollback()
         raise custom_exceptions.DatabaseOperationException(
             "Failed to fetch Patrons."
         )
 
 
-def get_patron_query(db, patron_id):
+async def count_patrons_query(db, exact_limit):
+    """
+    Count the Patrons, exactly for small tables and from the planner's
+    estimate for large ones.
+    Returns the total and whether it is an estimate.
+    """
+    try:
+        return await count_rows(db, "patrons.count", "FROM patrons", exact_limit=exact_limit)
+    except psycopg.Error as e:
+        await db.rollback()
+        raise custom_exceptions.DatabaseOperationException(
+            "Failed to count Patrons."
+        )
+
+
+async def get_patron_query(db, patron_id):
     """
     Fetch the Patron matching the given patron_id.
     """
     try:
-        sql = \
-        """
+        sql = statement("patrons.get", """
         SELECT
             id,
             first_name,
             last_name,
             email,
-            registration_date
+            registration_date,
+            version
         FROM
             patrons
         Where id = %(patron_id)s;
-        """
+        """)
         params = {'patron_id': patron_id}
-        patron = execute_sql_fetch_one(db, sql, params)
+        patron = await execute_sql_fetch_one(db, sql, params)
         if not patron:
             raise custom_exceptions.RecordNotFoundException("Patron not found")
         return patron
-    except psycopg2.Error as e:
-        db.rollback()
+    except psycopg.Error as e:
+        await db.rollback()
         raise custom_exceptions.DatabaseOperationException(
             "Failed to fetch the Patron."
         )
 
 
-def add_new_patron_query(db, patron) -> patrons_models.Patron:
+async def get_patron_version_query(db, patron_id):
+    """
+    Fetch the row version of the given Patron, None if it doesn't exist.
+    """
+    try:
+        sql = statement("patrons.version", """
+        SELECT version FROM patrons WHERE id = %(patron_id)s;
+        """)
+        row = await execute_sql_fetch_one(db, sql, {'patron_id': patron_id})
+        return row["version"] if row else None
+    except psycopg.Error as e:
+        await db.rollback()
+        raise custom_exceptions.DatabaseOperationException(
+            "Failed to fetch the Patron."
+        )
+
+
+async def add_new_patron_query(db, patron) -> patrons_models.Patron:
     """
     Add a new patron record to the database.
     """
@@ -79,17 +120,17 @@ def add_new_patron_query(db, patron) -> patrons_models.Patron:
             'registration_date': date.today()
         }
 
-        sql = """
+        sql = statement("patrons.insert", """
         INSERT INTO patrons (first_name, last_name, email, registration_date)
         VALUES (%(first_name)s, %(last_name)s, %(email)s, %(registration_date)s)
         RETURNING id, first_name, last_name, email, registration_date;
-        """
+        """)
 
-        with db.cursor() as cursor:
-            cursor.execute(sql, params)
-            result = cursor.fetchone()
+        async with db.cursor() as cursor:
+            await execute(cursor, sql, params)
+            result = await cursor.fetchone()
 
-        db.commit()
+        await db.commit()
 
         patron_id, first_name, last_name, email, registration_date = result
 
@@ -100,24 +141,24 @@ def add_new_patron_query(db, patron) -> patrons_models.Patron:
             email=email,
             registration_date=registration_date
         )
-    except psycopg2.errors.UniqueViolation as e:
-        db.rollback()
+    except psycopg.errors.UniqueViolation as e:
+        await db.rollback()
         raise custom_exceptions.DuplicateEntryException(
             "The given Email ID is already registered in the system."
         )
-    except psycopg2.Error:
-        db.rollback()
+    except psycopg.Error:
+        await db.rollback()
         raise custom_exceptions.DatabaseOperationException(
             "Failed to register patron to the library."
         )
 
 
-def update_patron_query(db, patron_id, update_data):
+async def update_patron_query(db, patron_id, update_data):
     """
     Update an existing patron in the database.
     """
     try:
-        with db.cursor() as cursor:
+        async with db.cursor() as cursor:
             # Prepare the UPDATE statement
             set_clauses = []
             params = {"patron_id": patron_id}
@@ -128,19 +169,20 @@ def update_patron_query(db, patron_id, update_data):
 
             patron_updated = None
             if set_clauses:
-                sql = f"""
+                # One registered statement per combination of updated columns
+                sql = statement(f"patrons.update[{','.join(update_data)}]", f"""
                 UPDATE patrons
                 SET {', '.join(set_clauses)}
                 WHERE id = %(patron_id)s
                 RETURNING id, first_name, last_name, email, registration_date;
-                """
-                cursor.execute(sql, params)
-                patron_updated = cursor.fetchone()
+                """)
+                await execute(cursor, sql, params)
+                patron_updated = await cursor.fetchone()
 
             if not patron_updated:
                 raise custom_exceptions.RecordNotFoundException("The patron with the given ID does not exist.")
 
-        db.commit()
+        await db.commit()
         return patrons_models.Patron(
             id=patron_updated[0],
             first_name=patron_updated[1],
@@ -149,113 +191,420 @@ def update_patron_query(db, patron_id, update_data):
             registration_date=patron_updated[4]
         )
 
-    except psycopg2.errors.UniqueViolation as e:
-        db.rollback()
+    except psycopg.errors.UniqueViolation as e:
+        await db.rollback()
         raise custom_exceptions.DuplicateEntryException(
             "A patron with the given email already exists."
         )
-    except psycopg2.Error as e:
-        db.rollback()
+    except psycopg.Error as e:
+        await db.rollback()
         raise custom_exceptions.DatabaseOperationException(
             "Failed to update the patron."
         )
 
 
-def borrow_book_query(db, patron_id, book_id):
+async def borrow_book_query(db, patron_id, book_id):
     """
     Lend the book to the patron.
     """
     try:
-        with db.cursor() as cursor:
-            # Check if the book exists and has available copies
-            sql_check_book = """
-            SELECT available_copies FROM books WHERE id = %(book_id)s FOR UPDATE;
-            """
-            cursor.execute(sql_check_book, {"book_id": book_id})
-            book = cursor.fetchone()
-
-            if not book:
+        async with db.cursor() as cursor:
+            # Take a copy and record the loan in one statement. The conditional
+            # UPDATE holds the book row lock only until the statement commits,
+            # and idx_loans_active_patron_book rejects a second active loan.
+            sql = statement("patrons.borrow", """
+            WITH book AS (
+                UPDATE books
+                SET available_copies = available_copies - 1
+                WHERE id = %(book_id)s AND available_copies > 0
+                RETURNING id
+            ), loan AS (
+                INSERT INTO loans (patron_id, book_id, loan_date, due_date)
+                SELECT %(patron_id)s, id, CURRENT_DATE, CURRENT_DATE + INTERVAL '14 days'
+                FROM book
+                RETURNING id
+            )
+            SELECT
+                (SELECT id FROM loan) AS loan_id,
+                EXISTS (SELECT 1 FROM books WHERE id = %(book_id)s) AS book_exists;
+            """)
+            await execute(cursor, sql, {"patron_id": patron_id, "book_id": book_id})
+            loan_id, book_exists = await cursor.fetchone()
+
+        if loan_id is None:
+            if not book_exists:
                 raise custom_exceptions.RecordNotFoundException("Book does not exist.")
-
-            available_copies = book[0]
-            if available_copies <= 0:
-                raise custom_exceptions.UnavailableResourceException("No available copies left for this book.")
-
-            # Check if the patron already has a pending loan for this book
-            sql_check_existing_loan = """
-            SELECT id FROM loans WHERE patron_id = %(patron_id)s AND book_id = %(book_id)s AND return_date IS NULL;
-            """
-            cursor.execute(sql_check_existing_loan, {"patron_id": patron_id, "book_id": book_id})
-            existing_loan = cursor.fetchone()
-
-            if existing_loan:
-                raise custom_exceptions.BusinessValidationException("User already has this book on loan.")
-
-            # Reduce available copies (relying on DB constraints to prevent negative values)
-            sql_update_copies = """
-            UPDATE books SET available_copies = available_copies - 1 WHERE id = %(book_id)s;
-            """
-            cursor.execute(sql_update_copies, {"book_id": book_id})
-
-            # Insert new loan record
-            sql_create_loan = """
-            INSERT INTO loans (patron_id, book_id, loan_date, due_date)
-            VALUES (%(patron_id)s, %(book_id)s, CURRENT_DATE, CURRENT_DATE + INTERVAL '14 days')
-            RETURNING id;
-            """
-            cursor.execute(sql_create_loan, {"patron_id": patron_id, "book_id": book_id})
-            loan_id = cursor.fetchone()[0]
+            raise custom_exceptions.UnavailableResourceException("No available copies left for this book.")
 
         # Commit transaction only if all operations succeed
-        db.commit()
+        await db.commit()
         return loan_id
 
-    except psycopg2.Error as e:
-        db.rollback()
+    except psycopg.errors.UniqueViolation as e:
+        await db.rollback()
+        raise custom_exceptions.BusinessValidationException("User already has this book on loan.")
+    except psycopg.errors.ForeignKeyViolation as e:
+        await db.rollback()
+        raise custom_exceptions.RecordNotFoundException("Patron does not exist.")
+    except psycopg.Error as e:
+        await db.rollback()
         raise custom_exceptions.DatabaseOperationException("Failed to lend book")
 
 
-def return_book(db, patron_id, book_id):
+# Loan filters, each served by a covering index on (patron_id, loan_date DESC, id DESC)
+LOAN_STATE_CLAUSES = {
+    patrons_models.LoanState.ACTIVE: "l.return_date IS NULL",
+    patrons_models.LoanState.RETURNED: "l.return_date IS NOT NULL",
+    patrons_models.LoanState.OVERDUE: "l.return_date IS NULL AND l.due_date < CURRENT_DATE",
+}
+
+
+async def get_patron_loans_query(db, patron_id, state, offset, limit, after=None):
+    """
+    Return the loans of the patron, newest first, along with their book titles.
+    Loans are ordered by (loan_date, id) descending; 'after' holds the keyset
+    of the last row of the previous page.
+    The covering loan indexes make the loans side an index-only scan; the
+    titles still cost one books primary key lookup per returned loan.
+    """
+    try:
+        where_clauses = ["l.patron_id = %(patron_id)s"]
+        params = {"patron_id": patron_id, "offset": offset, "limit": limit}
+        variant = [state.value if state else "all"]
+        if state:
+            where_clauses.append(LOAN_STATE_CLAUSES[state])
+        if after:
+            where_clauses.append("(l.loan_date, l.id) < (%(after_loan_date)s, %(after_id)s)")
+            params["after_loan_date"] = after["loan_date"]
+            params["after_id"] = after["id"]
+            variant.append("after")
+
+        sql = statement(f"patrons.loans[{','.join(variant)}]", f"""
+        SELECT
+            l.id,
+            l.book_id,
+            b.title,
+            l.loan_date,
+            l.due_date,
+            l.return_date
+        FROM loans l
+        JOIN books b ON b.id = l.book_id
+        WHERE {" AND ".join(where_clauses)}
+        ORDER BY l.loan_date DESC, l.id DESC
+        LIMIT %(limit)s OFFSET %(offset)s;
+        """)
+        return await execute_sql_fetch_all(db, sql, params)
+    except psycopg.Error as e:
+        await db.rollback()
+        raise custom_exceptions.DatabaseOperationException(
+            "Failed to fetch the loans of the Patron."
+        )
+
+
+async def return_book(db, patron_id, book_id):
     """
     Process the return of a borrowed book.
     """
     try:
-        with db.cursor() as cursor:
-            # Ensure that the book was actually loaned by the user and is not already returned
-            sql_check_loan = """
-            SELECT id FROM loans 
-            WHERE patron_id = %(patron_id)s 
-              AND book_id = %(book_id)s 
-              AND return_date IS NULL 
-            FOR UPDATE;
-            """
-            cursor.execute(sql_check_loan, {"patron_id": patron_id, "book_id": book_id})
-            loan = cursor.fetchone()
-
-            if not loan:
-                raise custom_exceptions.RecordNotFoundException("No active loan found for this book.")
-
-            loan_id = loan[0]
-
-            # Mark the return field in the loan table
-            sql_mark_return = """
-            UPDATE loans 
-            SET return_date = CURRENT_DATE 
-            WHERE id = %(loan_id)s;
-            """
-            cursor.execute(sql_mark_return, {"loan_id": loan_id})
-
-            # Bump up the available copies count for the said book
-            sql_update_copies = """
-            UPDATE books 
-            SET available_copies = available_copies + 1 
-            WHERE id = %(book_id)s;
-            """
-            cursor.execute(sql_update_copies, {"book_id": book_id})
+        async with db.cursor() as cursor:
+            # Close the active loan and put the copy back in one statement.
+            # The book row is locked before the loan row, the order every
+            # borrow and return path takes, so they can't deadlock each other.
+            sql = statement("patrons.return", """
+            WITH locked AS (
+                SELECT id
+                FROM books
+                WHERE id = %(book_id)s
+                FOR UPDATE
+            ), loan AS (
+                UPDATE loans
+                SET return_date = CURRENT_DATE
+                WHERE patron_id = %(patron_id)s
+                  AND book_id = (SELECT id FROM locked)
+                  AND return_date IS NULL
+                RETURNING book_id
+            ), book AS (
+                UPDATE books
+                SET available_copies = available_copies + 1
+                WHERE id IN (SELECT book_id FROM loan)
+                RETURNING id
+            )
+            SELECT count(*) FROM book;
+            """)
+            await execute(cursor, sql, {"patron_id": patron_id, "book_id": book_id})
+            returned = (await cursor.fetchone())[0]
+
+        if not returned:
+            raise custom_exceptions.RecordNotFoundException("No active loan found for this book.")
 
         # Commit transaction only if all operations succeed
-        db.commit()
+        await db.commit()
 
-    except psycopg2.Error as e:
-        db.rollback()
+    except psycopg.Error as e:
+        await db.rollback()
         raise custom_exceptions.DatabaseOperationException("Failed to return book")
+
+
+async def lock_batch_books(cursor, patron_id, book_ids) -> dict[int, int]:
+    """
+    Lock the rows of the requested books in id order, so that concurrent
+    batches touching the same books queue up instead of deadlocking.
+    Returns the available copies of each existing book.
+    """
+    sql_check_patron = statement("patrons.batch.check_patron", """
+    SELECT EXISTS (SELECT 1 FROM patrons WHERE id = %(patron_id)s);
+    """)
+    await execute(cursor, sql_check_patron, {"patron_id": patron_id})
+    if not (await cursor.fetchone())[0]:
+        raise custom_exceptions.RecordNotFoundException("Patron does not exist.")
+
+    sql_lock_books = statement("patrons.batch.lock_books", """
+    SELECT id, available_copies
+    FROM books
+    WHERE id = ANY(%(book_ids)s)
+    ORDER BY id
+    FOR UPDATE;
+    """)
+    await execute(cursor, sql_lock_books, {"book_ids": book_ids})
+    return dict(await cursor.fetchall())
+
+
+async def borrow_books_query(db, patron_id, book_ids, mode):
+    """
+    Lend several books to the patron in one transaction.
+
+    Returns whether the loans were committed and a result per distinct book,
+    in request order. In all_or_nothing mode a single failing book rolls the
+    whole batch back.
+    """
+    book_ids = list(dict.fromkeys(book_ids))
+    try:
+        results = {}
+        async with db.cursor() as cursor:
+            copies = await lock_batch_books(cursor, patron_id, book_ids)
+
+            sql_active_loans = statement("patrons.borrow_batch.active_loans", """
+            SELECT book_id
+            FROM loans
+            WHERE patron_id = %(patron_id)s
+              AND book_id = ANY(%(book_ids)s)
+              AND return_date IS NULL;
+            """)
+            await execute(cursor, sql_active_loans, {"patron_id": patron_id, "book_ids": book_ids})
+            on_loan = {row[0] for row in await cursor.fetchall()}
+
+            lendable = []
+            for book_id in book_ids:
+                if book_id not in copies:
+                    results[book_id] = {"book_id": book_id, "status": patrons_models.LoanStatus.NOT_FOUND}
+                elif book_id in on_loan:
+                    results[book_id] = {"book_id": book_id, "status": patrons_models.LoanStatus.ALREADY_BORROWED}
+                elif copies[book_id] <= 0:
+                    results[book_id] = {"book_id": book_id, "status": patrons_models.LoanStatus.UNAVAILABLE}
+                else:
+                    lendable.append(book_id)
+
+            if mode == patrons_models.BatchMode.ALL_OR_NOTHING and results:
+                await db.rollback()
+                for book_id in lendable:
+                    results[book_id] = {"book_id": book_id, "status": patrons_models.LoanStatus.SKIPPED}
+                return False, [results[book_id] for book_id in book_ids]
+
+            if lendable:
+                # The rows are locked already, so the copies are taken and the
+                # loans recorded in a single set-based statement
+                sql_lend = statement("patrons.borrow_batch.lend", """
+                WITH taken AS (
+                    UPDATE books
+                    SET available_copies = available_copies - 1
+                    WHERE id = ANY(%(book_ids)s)
+                    RETURNING id
+                )
+                INSERT INTO loans (patron_id, book_id, loan_date, due_date)
+                SELECT %(patron_id)s, id, CURRENT_DATE, CURRENT_DATE + INTERVAL '14 days'
+                FROM taken
+                RETURNING id, book_id;
+                """)
+                await execute(cursor, sql_lend, {"patron_id": patron_id, "book_ids": lendable})
+                for loan_id, book_id in await cursor.fetchall():
+                    results[book_id] = {
+                        "book_id": book_id, "status": patrons_models.LoanStatus.BORROWED, "loan_id": loan_id}
+
+        await db.commit()
+        return True, [results[book_id] for book_id in book_ids]
+
+    except psycopg.errors.UniqueViolation as e:
+        await db.rollback()
+        raise custom_exceptions.BusinessValidationException("User already has this book on loan.")
+    except psycopg.Error as e:
+        await db.rollback()
+        raise custom_exceptions.DatabaseOperationException("Failed to lend the books")
+
+
+async def return_books_query(db, patron_id, book_ids, mode):
+    """
+    Process the return of several books in one transaction.
+
+    Returns whether the returns were committed and a result per distinct
+    book, in request order. In all_or_nothing mode a single book without an
+    active loan rolls the whole batch back.
+    """
+    book_ids = list(dict.fromkeys(book_ids))
+    try:
+        async with db.cursor() as cursor:
+            # Books are locked before loans, the order every borrow and return path takes
+            await lock_batch_books(cursor, patron_id, book_ids)
+
+            sql_active_loans = statement("patrons.return_batch.active_loans", """
+            SELECT book_id, id
+            FROM loans
+            WHERE patron_id = %(patron_id)s
+              AND book_id = ANY(%(book_ids)s)
+              AND return_date IS NULL
+            FOR UPDATE;
+            """)
+            await execute(cursor, sql_active_loans, {"patron_id": patron_id, "book_ids": book_ids})
+            active_loans = dict(await cursor.fetchall())
+
+            committed = True
+            if mode == patrons_models.BatchMode.ALL_OR_NOTHING and len(active_loans) < len(book_ids):
+                await db.rollback()
+                committed = False
+            elif active_loans:
+                sql_return = statement("patrons.return_batch.return", """
+                WITH returned AS (
+                    UPDATE loans
+                    SET return_date = CURRENT_DATE
+                    WHERE id = ANY(%(loan_ids)s)
+                    RETURNING book_id
+                )
+                UPDATE books
+                SET available_copies = available_copies + 1
+                WHERE id IN (SELECT book_id FROM returned);
+                """)
+                await execute(cursor, sql_return, {"loan_ids": list(active_loans.values())})
+
+        if committed:
+            await db.commit()
+
+        results = []
+        for book_id in book_ids:
+            if book_id not in active_loans:
+                status = patrons_models.LoanStatus.NOT_BORROWED
+            elif committed:
+                status = patrons_models.LoanStatus.RETURNED
+            else:
+                status = patrons_models.LoanStatus.SKIPPED
+            results.append({"book_id": book_id, "status": status, "loan_id": active_loans.get(book_id)})
+        return committed, results
+
+    except psycopg.Error as e:
+        await db.rollback()
+        raise custom_exceptions.DatabaseOperationException("Failed to return the books")
+
+
+async def bulk_import_patrons_query(db, patrons, report) -> int:
+    """
+    Bulk load patrons with COPY through a staging table.
+
+    'patrons' is an async iterator of (row number, PatronCreate). Rows with a
+    duplicate email are recorded in the report instead of aborting the batch.
+    Returns the number of imported patrons.
+    """
+    try:
+        async with db.cursor() as cursor:
+            await cursor.execute("""
+            CREATE TEMP TABLE patron_import (
+                row_num INTEGER PRIMARY KEY,
+                first_name VARCHAR(255),
+                last_name VARCHAR(255),
+                email VARCHAR(255),
+                patron_id INTEGER,
+                error TEXT
+            ) ON COMMIT DROP;
+            """)
+
+            copy_sql = "COPY patron_import (row_num, first_name, last_name, email) FROM STDIN"
+            async with cursor.copy(copy_sql) as copy:
+                async for row_num, patron in patrons:
+                    await copy.write_row((row_num, patron.first_name, patron.last_name, patron.email))
+            await cursor.execute("ANALYZE patron_import;")
+
+            # Reject repeated emails within the batch, keeping the first occurrence
+            await cursor.execute("""
+            UPDATE patron_import i
+            SET error = 'Duplicate email within the import.'
+            FROM (
+                SELECT row_num, row_number() OVER (PARTITION BY email ORDER BY row_num) AS occurrence
+                FROM patron_import
+            ) d
+            WHERE d.row_num = i.row_num AND d.occurrence > 1;
+            """)
+
+            await cursor.execute("""
+            WITH inserted AS (
+                INSERT INTO patrons (first_name, last_name, email, registration_date)
+                SELECT first_name, last_name, email, CURRENT_DATE
+                FROM patron_import
+                WHERE error IS NULL
+                ORDER BY row_num
+                ON CONFLICT (email) DO NOTHING
+                RETURNING id, email
+            )
+            UPDATE patron_import i
+            SET patron_id = ins.id
+            FROM inserted ins
+            WHERE i.email = ins.email AND i.error IS NULL;
+            """)
+            imported = cursor.rowcount
+
+            # Rows skipped by ON CONFLICT are left without a patron_id
+            await cursor.execute("""
+            SELECT row_num, COALESCE(error, 'The given Email ID is already registered in the system.')
+            FROM patron_import
+            WHERE error IS NOT NULL OR patron_id IS NULL;
+            """)
+            for row_num, error in await cursor.fetchall():
+                report.add_error(row_num, error)
+
+        await db.commit()
+        return imported
+
+    except psycopg.Error as e:
+        await db.rollback()
+        raise custom_exceptions.DatabaseOperationException(
+            "Failed to import the patrons."
+        )
+
+
+async def export_patrons_query(db, export_format: ExportFormat):
+    """
+    Stream all Patrons as NDJSON or CSV byte chunks.
+    """
+    if export_format == ExportFormat.CSV:
+        sql = """
+        COPY (
+            SELECT id, first_name, last_name, email, registration_date
+            FROM patrons
+            ORDER BY id
+        ) TO STDOUT WITH (FORMAT csv, HEADER);
+        """
+        chunks = stream_copy_out(db, sql)
+    else:
+        sql = """
+        SELECT row_to_json(patron)::text
+        FROM (
+            SELECT id, first_name, last_name, email, registration_date
+            FROM patrons
+            ORDER BY id
+        ) AS patron;
+        """
+        chunks = stream_text_rows(db, sql)
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except psycopg.Error as e:
+        await db.rollback()
+        raise custom_exceptions.DatabaseOperationException(
+            "Failed to export patrons."
+        )
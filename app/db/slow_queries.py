@@ -0,0 +1,153 @@
+"""
+Slow query capture
+
+Queries slower than SLOW_QUERY_THRESHOLD_MS are logged with their statement
+fingerprint, the shape of their parameters (never the values) and their
+duration, and kept in an in-memory ring buffer served by the admin API.
+
+A sampled share of them also gets an EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)
+plan. The plan is captured in the background on a separate pooled connection,
+inside a read-only transaction that is always rolled back: ANALYZE really runs
+the statement, so statements that write are explained without ANALYZE instead
+of being repeated.
+"""
+
+import asyncio
+import hashlib
+import random
+import re
+import time
+from collections import deque
+from datetime import datetime, timezone
+import psycopg
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import current_request_metrics
+from app.db import connection
+from app.db.consistency import current_session
+from app.db.statements import Statement
+
+# Most recent slow queries, oldest first
+slow_query_log: deque[dict] = deque(maxlen=settings.slow_query_buffer_size)
+
+# One plan capture at a time, so that a burst of slow queries can't drain the pool
+_explain_slots = asyncio.Semaphore(1)
+_explain_tasks: set[asyncio.Task] = set()
+
+# Statements that are already an EXPLAIN, after any leading comments
+EXPLAIN_PATTERN = re.compile(r"\s*(/\*.*?\*/\s*)*EXPLAIN\b", re.IGNORECASE | re.DOTALL)
+
+
+def fingerprint(sql) -> str:
+    """
+    Stable identifier of a statement: the registered name, or a hash of the
+    whitespace normalised SQL for ad-hoc statements.
+    """
+    if isinstance(sql, Statement):
+        return sql.name
+    normalised = re.sub(r"\s+", " ", str(sql)).strip()
+    return "sql:" + hashlib.sha1(normalised.encode()).hexdigest()[:12]
+
+
+def params_shape(params):
+    """
+    The types (and list lengths) of the query parameters, without their values.
+    """
+    def shape(value):
+        if isinstance(value, (list, tuple)):
+            return f"{type(value).__name__}[{len(value)}]"
+        return type(value).__name__
+
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: shape(value) for key, value in params.items()}
+    return [shape(value) for value in params]
+
+
+def capture(sql, params, seconds: float, explain: bool = True):
+    """
+    Record a query that ran for 'seconds', if it exceeds the slow query threshold.
+    'explain' allows sampling it for a plan capture.
+    """
+    # The pool's connection checks run an empty query, and the row estimates
+    # an EXPLAIN, which has no plan of its own to capture
+    if seconds * 1000 < settings.slow_query_threshold_ms or not str(sql).strip():
+        return
+    if EXPLAIN_PATTERN.match(str(sql)):
+        return
+
+    entry = {
+        "fingerprint": fingerprint(sql),
+        "sql": str(sql),
+        "params_shape": params_shape(params),
+        "duration_ms": round(seconds * 1000, 3),
+        "captured_at": datetime.now(timezone.utc),
+        "plan": None,
+        "plan_error": None,
+    }
+    slow_query_log.append(entry)
+    logger.warning(
+        "Slow query %s took %.1f ms, params %s",
+        entry["fingerprint"], entry["duration_ms"], entry["params_shape"]
+    )
+
+    if not explain or _explain_slots.locked():
+        return
+    if random.random() < settings.slow_query_explain_sample_rate:
+        task = asyncio.create_task(capture_plan(entry, sql, params))
+        _explain_tasks.add(task)
+        task.add_done_callback(_explain_tasks.discard)
+
+
+async def capture_plan(entry: dict, sql, params):
+    """
+    Capture the plan of a slow query into its entry.
+    """
+    # Don't account the capture against the request that triggered it, nor
+    # read or move its session's consistency token
+    current_request_metrics.set(None)
+    current_session.set(None)
+    async with _explain_slots:
+        started = time.perf_counter()
+        try:
+            async with connection.db_connection() as conn:
+                # A plain cursor, so that a slow EXPLAIN isn't captured in turn
+                cursor = psycopg.AsyncCursor(conn)
+                try:
+                    entry["plan"] = await run_explain(cursor, sql, params, analyze=True)
+                except psycopg.errors.ReadOnlySqlTransaction:
+                    await conn.rollback()
+                    entry["plan"] = await run_explain(cursor, sql, params, analyze=False)
+                finally:
+                    await conn.rollback()
+                    await cursor.close()
+        except Exception as e:
+            entry["plan_error"] = str(e)
+            logger.warning("Could not explain slow query %s: %s", entry["fingerprint"], e)
+            return
+        logger.info(
+            "Plan of slow query %s captured in %.1f ms: %s",
+            entry["fingerprint"], (time.perf_counter() - started) * 1000, entry["plan"]
+        )
+
+
+async def run_explain(cursor, sql, params, analyze: bool):
+    """
+    EXPLAIN the statement in a fresh read-only transaction, left for the caller to roll back.
+    """
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    await cursor.execute("SET TRANSACTION READ ONLY;")
+    await cursor.execute(
+        "SELECT set_config('statement_timeout', %s, true);",
+        (str(settings.slow_query_explain_timeout_ms),)
+    )
+    await cursor.execute(f"EXPLAIN ({options}) {sql}", params)
+    return (await cursor.fetchone())[0]
+
+
+def recent_slow_queries() -> list[dict]:
+    """
+    The captured slow queries, newest first.
+    """
+    return list(reversed(slow_query_log))
@@ -0,0 +1,54 @@
+"""
+Prepared statement registry
+
+Every query the app runs repeatedly is registered here under a stable name.
+psycopg prepares a registered statement the first time a pooled connection
+runs it and executes it by its server-side name from then on, so Postgres
+parses and plans it once per connection instead of on every call.
+
+psycopg deallocates every prepared statement of a connection when a
+transaction is rolled back. db_connection therefore ends the transactions of
+read-only requests with a commit, even when the request failed, and the
+statements only have to be prepared again after a failed write.
+"""
+
+from app.core.config import settings
+
+
+class Statement(str):
+    """
+    SQL text registered under a stable name.
+    The name is prepended as a comment so it shows up in pg_stat_statements and logs.
+    """
+    name: str
+
+
+_registry: dict[str, Statement] = {}
+
+
+def statement(name: str, sql: str) -> Statement:
+    """
+    Return the statement registered under name, registering sql on first use.
+
+    Dynamic SQL must encode every variant in the name (e.g. the set of
+    filters of a listing), so that each name maps to exactly one SQL text.
+    """
+    registered = _registry.get(name)
+    if registered is None:
+        registered = Statement(f"/* {name} */ {sql.strip()}")
+        registered.name = name
+        _registry[name] = registered
+    return registered
+
+
+def prepare_mode(sql) -> bool | None:
+    """
+    The 'prepare' argument for psycopg's execute().
+
+    Registered statements are prepared on first use, unless prepared statements
+    are disabled for transaction pooling proxies such as PgBouncer. Ad-hoc SQL
+    falls back to the connection's prepare_threshold.
+    """
+    if not isinstance(sql, Statement):
+        return None
+    return settings.db_prepared_statements
@@ -5,16 +5,40 @@ Author: Sandeep Sharma
 Author Email: sandeeptech8@gmail.com
 """
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
 from app.api.books import router as books_router
 from app.api.authors import router as authors_router
 from app.api.patrons import router as patrons_router
+from app.api.loans import router as loans_router
+from app.api.metrics import router as metrics_router
+from app.api.admin import router as admin_router
 from app.core import exceptions as custom_exceptions
 from app.core import exception_handlers
 from app.core.APIKeyAuthMiddleware import APIKeyAuthMiddleware
+from app.core.RequestMetricsMiddleware import RequestMetricsMiddleware
+from app.core.RequestIdMiddleware import RequestIdMiddleware
+from app.core.ReadConsistencyMiddleware import ReadConsistencyMiddleware
+from app.core.ServerErrorMiddleware import ServerErrorMiddleware
+from app.core.config import settings
+from app.core.logger import configure_logging, shutdown_logging
+from app.db.connection import open_db_pool, close_db_pool
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Configures logging and opens the DB pool on startup, closes them on shutdown.
+    """
+    configure_logging(settings.log_level, settings.log_file, settings.log_levels, settings.log_debug_sample_rate)
+    await open_db_pool()
+    yield
+    await close_db_pool()
+    shutdown_logging()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Customise openapi to requrie a x-api-header header field for all endpoints.
 app.original_openapi = app.openapi
@@ -44,13 +68,20 @@ def custom_openapi():
     return openapi_schema
 app.openapi = custom_openapi
 
-# Register middlewares
+# Register middlewares (the last one added runs first)
+app.add_middleware(ServerErrorMiddleware)
+app.add_middleware(ReadConsistencyMiddleware)
 app.add_middleware(APIKeyAuthMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
 
 # Register routers
 app.include_router(books_router, prefix='/books', tags=['Books'])
 app.include_router(authors_router, prefix='/authors', tags=['Authors'])
 app.include_router(patrons_router, prefix='/patrons', tags=['Patrons'])
+app.include_router(loans_router, prefix='/loans', tags=['Loans'])
+app.include_router(metrics_router, tags=['Metrics'])
+app.include_router(admin_router, prefix='/admin', tags=['Admin'])
 
 # Register exception handlers
 app.add_exception_handler(RequestValidationError,
@@ -69,5 +100,7 @@ app.add_exception_handler(custom_exceptions.UnavailableResourceException,
                           exception_handlers.unavailable_resource_exception_handler)
 app.add_exception_handler(custom_exceptions.DatabaseOperationException,
                           exception_handlers.database_operation_exception_handler)
+app.add_exception_handler(custom_exceptions.DatabaseBusyException,
+                          exception_handlers.database_busy_exception_handler)
 app.add_exception_handler(
     Exception, exception_handlers.global_exception_handler)
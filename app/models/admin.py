@@ -0,0 +1,20 @@
+"""
+Admin models.
+"""
+from datetime import datetime
+from typing import Any
+from pydantic import BaseModel
+
+
+class SlowQuery(BaseModel):
+    """
+    A query that exceeded the slow query threshold.
+    """
+    fingerprint: str
+    sql: str
+    params_shape: dict[str, str] | list[str] | None = None
+    duration_ms: float
+    captured_at: datetime
+    # EXPLAIN (FORMAT JSON) output, when the query was sampled and explained
+    plan: Any = None
+    plan_error: str | None = None
@@ -2,6 +2,7 @@
 Author models.
 """
 from datetime import date
+from enum import Enum
 from pydantic import BaseModel
 
 
@@ -21,6 +22,31 @@ class Author(BaseAuthor):
     id: int
 
 
+class AuthorBook(BaseModel):
+    """
+    Model of Book entity as found in the Authors response
+    """
+    id: int
+    title: str
+    isbn: str
+    genre: str | None = None
+    publication_date: date | None = None
+
+
+class AuthorWithBooks(Author):
+    """
+    Author entity model along with the author's books.
+    """
+    books: list[AuthorBook]
+
+
+class AuthorInclude(str, Enum):
+    """
+    Related records that can be included in the Authors responses
+    """
+    BOOKS = "books"
+
+
 class AuthorCreate(BaseAuthor):
     """
     Model for 'create author' API request body.
@@ -3,6 +3,7 @@ Pydantic models for Books API request response validation
 """
 
 from datetime import date
+from enum import Enum
 from pydantic import BaseModel
 from pydantic_extra_types.isbn import ISBN
 
@@ -62,3 +63,13 @@ class BookFilters(BaseModel):
     author: str | None = None
     isbn: ISBN | None = None
     genre: str | None = None
+    q: str | None = None
+    fuzzy: bool = False
+
+
+class BookSort(str, Enum):
+    """
+    Sort orders of the 'get all books' API
+    """
+    TITLE = "title"
+    RELEVANCE = "relevance"
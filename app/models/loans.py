@@ -0,0 +1,40 @@
+"""
+Loans models
+"""
+
+from datetime import date
+from pydantic import BaseModel, Field
+
+
+class OverdueLoanFilters(BaseModel):
+    """
+    Filters for the overdue loans APIs
+    """
+    patron_id: int | None = None
+    book_id: int | None = None
+    genre: str | None = None
+    min_days_overdue: int = Field(default=1, ge=1)
+
+
+class OverdueLoan(BaseModel):
+    """
+    An active loan past its due date.
+    """
+    id: int
+    patron_id: int
+    book_id: int
+    title: str
+    genre: str | None = None
+    loan_date: date
+    due_date: date
+    days_overdue: int
+
+
+class OverduePatronSummary(BaseModel):
+    """
+    Overdue loans of a single patron.
+    """
+    patron_id: int
+    overdue_loans: int
+    oldest_due_date: date
+    max_days_overdue: int
@@ -3,7 +3,11 @@ Patrons model
 """
 
 from datetime import date
-from pydantic import BaseModel, EmailStr
+from enum import Enum
+from pydantic import BaseModel, EmailStr, Field
+
+# Books a single batch checkout or check-in may hold
+MAX_BATCH_BOOKS = 50
 
 class PatronBase(BaseModel):
     """
@@ -36,3 +40,74 @@ class PatronUpdate(PatronBase):
     first_name: str | None = None
     last_name: str | None = None
     email: EmailStr | None = None
+
+
+class BatchMode(str, Enum):
+    """
+    Commit behaviour of the batch checkout and check-in APIs
+    """
+    # Commit the books that succeeded, report the others
+    PARTIAL = "partial"
+    # Commit nothing unless every book succeeds
+    ALL_OR_NOTHING = "all_or_nothing"
+
+
+class LoanStatus(str, Enum):
+    """
+    Outcome of a single book in a batch checkout or check-in
+    """
+    BORROWED = "borrowed"
+    RETURNED = "returned"
+    NOT_FOUND = "not_found"
+    UNAVAILABLE = "unavailable"
+    ALREADY_BORROWED = "already_borrowed"
+    NOT_BORROWED = "not_borrowed"
+    # Would have succeeded, but an all_or_nothing batch was rolled back
+    SKIPPED = "skipped"
+
+
+class LoanState(str, Enum):
+    """
+    Loan filters of the patron loans API
+    """
+    ACTIVE = "active"
+    RETURNED = "returned"
+    # Active and past their due date
+    OVERDUE = "overdue"
+
+
+class PatronLoan(BaseModel):
+    """
+    A loan as found in the patron loans response.
+    """
+    id: int
+    book_id: int
+    title: str
+    loan_date: date
+    due_date: date
+    return_date: date | None = None
+
+
+class BatchLoanRequest(BaseModel):
+    """
+    Model for the batch checkout and check-in API request body.
+    """
+    book_ids: list[int] = Field(min_length=1, max_length=MAX_BATCH_BOOKS)
+    mode: BatchMode = BatchMode.PARTIAL
+
+
+class BookLoanResult(BaseModel):
+    """
+    Result of a single book in a batch checkout or check-in.
+    """
+    book_id: int
+    status: LoanStatus
+    loan_id: int | None = None
+
+
+class BatchLoanResult(BaseModel):
+    """
+    Result of a batch checkout or check-in.
+    """
+    committed: bool
+    results: list[BookLoanResult]
@@ -24,3 +24,38 @@ class APIResponse(BaseModel, Generic[T]):
     message: str
     data: T | None = None
     error: ErrorDetail | None = None
+
+
+class PageMeta(BaseModel):
+    """
+    Pagination metadata for listing responses
+    """
+    next_cursor: str | None = None
+    # Only with include_total; 'total_estimated' tells whether total is an estimate
+    total: int | None = None
+    total_estimated: bool | None = None
+
+
+class PaginatedAPIResponse(APIResponse[T], Generic[T]):
+    """
+    API response structure for paginated listings
+    """
+    meta: PageMeta | None = None
+
+
+class ImportRowError(BaseModel):
+    """
+    A row rejected by a bulk import
+    """
+    row: int
+    error: str
+
+
+class BulkImportResult(BaseModel):
+    """
+    Outcome of a bulk import
+    """
+    received: int
+    imported: int
+    failed: int
+    errors: list[ImportRowError]
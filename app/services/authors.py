@@ -5,42 +5,101 @@ Authors services
 
 from app.db.queries import authors as authors_queries
 from app.models import authors as authors_models
+from app.core import pagination
+from app.core.config import settings
+from app.db.connection import stream_with_db
+from app.services.books import invalidate_book_cache
+from app.services import imports
 
+# Sort key of the authors listing, in ORDER BY order
+AUTHORS_CURSOR_KEYS = {"id": int}
 
-def get_all_authors_service(db, offset=0, limit=10):
+
+async def include_author_books(db, authors: list[dict]):
+    """
+    Attach each author's books, loaded for all the authors at once.
+    """
+    books_by_author = await authors_queries.get_books_by_author_ids(
+        db, [author["id"] for author in authors], settings.author_books_limit)
+    for author in authors:
+        author["books"] = books_by_author.get(author["id"], [])
+
+
+async def get_all_authors_service(db, offset=0, limit=10, cursor=None, include=None):
     """
     Fetch all authors with optional filters and pagination.
+    Returns the page of authors and the cursor of the next page.
     """
-    all_authors = authors_queries.get_all_authors_query(db, offset, limit)
-    return all_authors
+    after = pagination.decode_cursor(cursor, AUTHORS_CURSOR_KEYS) if cursor else None
+    all_authors = await authors_queries.get_all_authors_query(db, offset, limit + 1, after)
+    all_authors, next_cursor = pagination.paginate(all_authors, limit, AUTHORS_CURSOR_KEYS)
+    if include == authors_models.AuthorInclude.BOOKS:
+        await include_author_books(db, all_authors)
+    return all_authors, next_cursor
 
 
-def get_author_service(db, author_id):
+async def count_authors_service(db):
+    """
+    Returns the number of authors and whether it is an estimate.
+    """
+    return await authors_queries.count_authors_query(db, settings.exact_count_limit)
+
+
+async def get_author_service(db, author_id, include=None):
     """
     Returns the authors matching the given author_id
     """
-    author = authors_queries.get_author(db, author_id)
+    author = await authors_queries.get_author(db, author_id)
+    if include == authors_models.AuthorInclude.BOOKS:
+        await include_author_books(db, [author])
     return author
 
 
-def add_new_author_service(db, book: authors_models.AuthorCreate) -> authors_models.Author:
+async def get_author_version_service(db, author_id):
+    """
+    Returns the row version of the author, None if it doesn't exist
+    """
+    return await authors_queries.get_author_version(db, author_id)
+
+
+async def add_new_author_service(db, book: authors_models.AuthorCreate) -> authors_models.Author:
     """
     Add a new Author to the library database
     """
-    author = authors_queries.add_new_author_query(db, book)
+    author = await authors_queries.add_new_author_query(db, book)
     return author
 
 
-def update_author_service(db, author_id: int, update_data: dict) -> authors_models.Author:
+async def update_author_service(db, author_id: int, update_data: dict) -> authors_models.Author:
     """
     Update an author record.
     """
-    updated_author = authors_queries.update_author_query(db, author_id, update_data)
+    updated_author = await authors_queries.update_author_query(db, author_id, update_data)
+    # Cached books embed author names; renames are rare enough to drop them all
+    invalidate_book_cache(db)
     return updated_author
 
 
-def delete_author_service(db, author_id: int):
+async def bulk_import_authors_service(db, chunks, content_type):
+    """
+    Import authors from a streamed NDJSON or CSV body.
+    """
+    report = imports.ImportReport()
+    records = imports.iter_records(chunks, content_type, report)
+    authors = imports.validate_records(records, authors_models.AuthorCreate, report)
+    report.imported = await authors_queries.bulk_import_authors_query(db, authors)
+    return report.to_result()
+
+
+async def delete_author_service(db, author_id: int):
     """
     Delete author.
     """
     # NOTE :: Under construction
+
+
+async def export_authors_service(export_format):
+    """
+    Stream all authors in the given format.
+    """
+    return stream_with_db(authors_queries.export_authors_query, export_format)
@@ -4,43 +4,123 @@ Books services
 
 from app.db.queries import books as books_queries
 from app.models import books as books_models
+from app.core import pagination
+from app.db.connection import after_transaction, stream_with_db
+from app.db.consistency import read_after_lsn
+from app.core import exceptions as custom_exceptions
+from app.core.cache import Cache, InMemoryLRUBackend
+from app.core.config import settings
+from app.services import imports
 
+# Sort key of the books listing, in ORDER BY order
+BOOKS_CURSOR_KEYS = {"title": str, "id": int}
 
-def get_all_books_service(db, filters=None, offset=0, limit=10):
+# Single book lookups keyed by book id. Entries are per process, so the TTL
+# bounds how stale other workers can be after a write.
+book_cache = Cache(
+    InMemoryLRUBackend(settings.book_cache_max_entries, settings.book_cache_ttl),
+    enabled=settings.book_cache_enabled
+)
+
+
+def invalidate_book_cache(db, book_id: int | None = None):
+    """
+    Drop the cached book, or every cached book when no book_id is given,
+    once the request's transaction on db is over.
+    """
+    async def invalidate():
+        await book_cache.invalidate(book_id)
+    after_transaction(db, invalidate)
+
+
+async def get_all_books_service(db, filters=None, offset=0, limit=10, cursor=None,
+                                sort=books_models.BookSort.TITLE):
     """
     Fetch all books with optional filters and pagination.
+    Returns the page of books and the cursor of the next page.
+    Relevance ordered listings only support offset pagination.
     """
-    all_books = books_queries.get_all_books_query(db, filters, offset, limit)
-    return all_books
+    if sort == books_models.BookSort.RELEVANCE:
+        if cursor:
+            raise custom_exceptions.BusinessValidationException(
+                "Cursor pagination is not supported when sorting by relevance.")
+        all_books = await books_queries.get_all_books_query(db, filters, offset, limit, sort=sort)
+        return all_books, None
 
+    after = pagination.decode_cursor(cursor, BOOKS_CURSOR_KEYS) if cursor else None
+    all_books = await books_queries.get_all_books_query(db, filters, offset, limit + 1, after)
+    return pagination.paginate(all_books, limit, BOOKS_CURSOR_KEYS)
 
-def get_book_service(db, book_id):
+
+async def count_books_service(db, filters=None):
+    """
+    Returns the number of books matching the filters and whether it is an estimate.
+    """
+    return await books_queries.count_books_query(db, filters, settings.exact_count_limit)
+
+
+async def get_book_service(db, book_id):
     """
     Returns the books matching the given book_id
+    Requests holding a session token skip the cache, which may predate their writes.
     """
-    book = books_queries.get_book(db, book_id)
+    book = await book_cache.get(book_id) if read_after_lsn() is None else None
+    if book is None:
+        generation = book_cache.generation
+        book = await books_queries.get_book(db, book_id)
+        await book_cache.set(book_id, book, generation)
     return book
 
 
-def add_new_book_service(db, book: books_models.BookCreate):
+async def get_book_version_service(db, book_id):
+    """
+    Returns the row version of the book, from the cache when it holds the book
+    """
+    book = await book_cache.get(book_id) if read_after_lsn() is None else None
+    if book is not None:
+        return book["version"]
+    return await books_queries.get_book_version(db, book_id)
+
+
+async def add_new_book_service(db, book: books_models.BookCreate):
     """
     Add a new book to the library database
     """
-    book_id = books_queries.add_new_book(db, book)
+    book_id = await books_queries.add_new_book(db, book)
     return book_id
 
 
-def update_book_service(db, book_id: int, update_data: dict):
+async def update_book_service(db, book_id: int, update_data: dict):
     """
     Update a book record and its associated authors
     """
-    book_id = books_queries.update_book(db, book_id, update_data)
+    book_id = await books_queries.update_book(db, book_id, update_data)
+    invalidate_book_cache(db, book_id)
     return book_id
 
 
-def delete_book_service(db, book_id: int):
+async def delete_book_service(db, book_id: int):
     """
     Delete book and its association with author/s corresponding to given book_id.
     """
-    books_queries.delete_book(db, book_id)
+    await books_queries.delete_book(db, book_id)
+    invalidate_book_cache(db, book_id)
     return True
+
+
+async def bulk_import_books_service(db, chunks, content_type):
+    """
+    Import books from a streamed NDJSON or CSV body.
+    """
+    report = imports.ImportReport()
+    records = imports.iter_records(chunks, content_type, report, list_fields={"author_ids"})
+    books = imports.validate_records(records, books_models.BookCreate, report)
+    report.imported = await books_queries.bulk_import_books_query(db, books, report)
+    return report.to_result()
+
+
+async def export_books_service(export_format):
+    """
+    Stream all books in the given format.
+    """
+    return stream_with_db(books_queries.export_books_query, export_format)
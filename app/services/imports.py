@@ -0,0 +1,154 @@
+"""
+Bulk import services
+"""
+
+import codecs
+import csv
+import json
+from typing import AsyncIterator
+from pydantic import BaseModel, ValidationError
+from app.core import exceptions as custom_exceptions
+from app.models.responses import BulkImportResult, ImportRowError
+
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+CSV_CONTENT_TYPES = {"text/csv"}
+
+# Separator of list values (e.g. author_ids) inside a CSV cell
+CSV_LIST_SEPARATOR = ";"
+
+
+class ImportReport:
+    """
+    Running tally of a bulk import.
+    """
+    def __init__(self):
+        self.received = 0
+        self.imported = 0
+        self.errors: list[ImportRowError] = []
+
+    def add_error(self, row: int, error: str):
+        """Record a rejected row."""
+        self.errors.append(ImportRowError(row=row, error=error))
+
+    def to_result(self) -> BulkImportResult:
+        """Summarise the import for the API response."""
+        return BulkImportResult(
+            received=self.received,
+            imported=self.imported,
+            failed=len(self.errors),
+            errors=sorted(self.errors, key=lambda error: error.row)
+        )
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Split a stream of UTF-8 encoded chunks into lines without buffering the body.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def iter_csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[list[str] | None]:
+    """
+    Parse CSV lines into rows of values, joining the lines of a quoted field
+    that spans several, one record at a time. Blank lines are skipped.
+    A record left open by an unterminated quote at the end of the body
+    yields None.
+    """
+    pending = []
+    quotes = 0
+    async for line in lines:
+        if not pending and not line.strip():
+            continue
+        pending.append(line)
+        # Quotes inside quoted fields are doubled, so an odd count means a field is still open
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        yield next(csv.reader(["\n".join(pending)]))
+        pending = []
+        quotes = 0
+    if pending:
+        yield None
+
+
+def iter_records(chunks, content_type, report: ImportReport, list_fields=frozenset()):
+    """
+    Parse an NDJSON or CSV body into (row number, record dict) pairs.
+
+    NDJSON holds one record per line. CSV needs a header line, may hold
+    quoted fields spanning several lines and holds list fields as
+    CSV_LIST_SEPARATOR separated values.
+    Unparsable rows are recorded in the report and skipped.
+    The content type is checked eagerly, before any row is consumed.
+    """
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type not in NDJSON_CONTENT_TYPES | CSV_CONTENT_TYPES:
+        raise custom_exceptions.BusinessValidationException(
+            "Unsupported content type; send application/x-ndjson or text/csv.")
+    return _parse_records(chunks, media_type in CSV_CONTENT_TYPES, report, list_fields)
+
+
+async def _parse_records(chunks, is_csv, report, list_fields):
+    """
+    Row parser behind iter_records.
+    """
+    header = None
+    row = 0
+    entries = iter_csv_rows(iter_lines(chunks)) if is_csv else iter_lines(chunks)
+    async for entry in entries:
+        if not is_csv and not entry.strip():
+            continue
+        if is_csv and header is None:
+            header = [name.strip() for name in entry or []]
+            continue
+
+        row += 1
+        report.received += 1
+        if is_csv:
+            values = entry
+            if values is None:
+                report.add_error(row, "Unterminated quoted field.")
+                continue
+            if len(values) != len(header):
+                report.add_error(row, f"Expected {len(header)} columns, got {len(values)}.")
+                continue
+            record = {}
+            for name, value in zip(header, values):
+                if name in list_fields:
+                    value = [item.strip() for item in value.split(CSV_LIST_SEPARATOR) if item.strip()]
+                elif value == "":
+                    continue
+                record[name] = value
+        else:
+            try:
+                record = json.loads(entry)
+            except ValueError:
+                report.add_error(row, "Invalid JSON.")
+                continue
+            if not isinstance(record, dict):
+                report.add_error(row, "Expected a JSON object.")
+                continue
+        yield row, record
+
+
+async def validate_records(records, model: type[BaseModel], report: ImportReport):
+    """
+    Validate parsed records against the model, yielding (row number, instance).
+    Invalid rows are recorded in the report and skipped.
+    """
+    async for row, record in records:
+        try:
+            yield row, model.model_validate(record)
+        except ValidationError as e:
+            report.add_error(row, "; ".join(
+                f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()
+            ))
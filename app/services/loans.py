@@ -0,0 +1,35 @@
+"""
+Loans services
+"""
+
+from datetime import date
+from app.db.queries import loans as loans_queries
+from app.core import pagination
+from app.db.connection import stream_with_db
+
+# Sort key of the overdue loans listing, in ORDER BY order
+OVERDUE_CURSOR_KEYS = {"due_date": date, "id": int}
+
+
+async def get_overdue_loans_service(db, filters, offset=0, limit=10, cursor=None):
+    """
+    Fetch the overdue loans matching the filters.
+    Returns the page of loans and the cursor of the next page.
+    """
+    after = pagination.decode_cursor(cursor, OVERDUE_CURSOR_KEYS) if cursor else None
+    overdue_loans = await loans_queries.get_overdue_loans_query(db, filters, offset, limit + 1, after)
+    return pagination.paginate(overdue_loans, limit, OVERDUE_CURSOR_KEYS)
+
+
+async def get_overdue_patrons_service(db, filters, offset=0, limit=10):
+    """
+    Fetch the per-patron rollup of the overdue loans matching the filters.
+    """
+    return await loans_queries.get_overdue_patrons_query(db, filters, offset, limit)
+
+
+async def export_overdue_loans_service(filters, export_format):
+    """
+    Stream every overdue loan matching the filters in the given format.
+    """
+    return stream_with_db(loans_queries.export_overdue_loans_query, filters, export_format)
@@ -2,52 +2,142 @@
 Patrons services
 """
 
+from datetime import date
 from app.db.queries import patrons as patrons_queries
 from app.models import patrons as patrons_models
+from app.core import pagination
+from app.core import exceptions as custom_exceptions
+from app.core.config import settings
+from app.db.connection import stream_with_db
+from app.services.books import invalidate_book_cache
+from app.services import imports
 
+# Sort key of the patrons listing, in ORDER BY order
+PATRONS_CURSOR_KEYS = {"id": int}
 
-def get_all_patrons_service(db, offset=0, limit=10):
+# Sort key of the patron loans listing, in ORDER BY order
+PATRON_LOANS_CURSOR_KEYS = {"loan_date": date, "id": int}
+
+
+async def get_all_patrons_service(db, offset=0, limit=10, cursor=None):
     """
     Fetch all patrons.
+    Returns the page of patrons and the cursor of the next page.
+    """
+    after = pagination.decode_cursor(cursor, PATRONS_CURSOR_KEYS) if cursor else None
+    all_patrons = await patrons_queries.get_all_patrons_query(db, offset, limit + 1, after)
+    return pagination.paginate(all_patrons, limit, PATRONS_CURSOR_KEYS)
+
+
+async def count_patrons_service(db):
+    """
+    Returns the number of patrons and whether it is an estimate.
     """
-    all_patrons = patrons_queries.get_all_patrons_query(db, offset, limit)
-    return all_patrons
+    return await patrons_queries.count_patrons_query(db, settings.exact_count_limit)
 
 
-def get_patron_service(db, patron_id):
+async def get_patron_service(db, patron_id):
     """
     Returns the patron matching the given patron_id
     """
-    patron = patrons_queries.get_patron_query(db, patron_id)
+    patron = await patrons_queries.get_patron_query(db, patron_id)
     return patron
 
 
-def add_new_patron_service(db, patron: patrons_models.PatronCreate) -> patrons_models.Patron:
+async def get_patron_version_service(db, patron_id):
+    """
+    Returns the row version of the patron, None if it doesn't exist
+    """
+    return await patrons_queries.get_patron_version_query(db, patron_id)
+
+
+async def get_patron_loans_service(db, patron_id, state=None, offset=0, limit=10, cursor=None):
+    """
+    Fetch the loans of the patron, newest first.
+    Returns the page of loans and the cursor of the next page.
+    """
+    after = pagination.decode_cursor(cursor, PATRON_LOANS_CURSOR_KEYS) if cursor else None
+    loans = await patrons_queries.get_patron_loans_query(db, patron_id, state, offset, limit + 1, after)
+    # An empty page is cheap to tell apart from an unknown patron
+    if not loans and await patrons_queries.get_patron_version_query(db, patron_id) is None:
+        raise custom_exceptions.RecordNotFoundException("Patron not found")
+    return pagination.paginate(loans, limit, PATRON_LOANS_CURSOR_KEYS)
+
+
+async def add_new_patron_service(db, patron: patrons_models.PatronCreate) -> patrons_models.Patron:
     """
     Add a new Patron to the library database.
     """
-    patron = patrons_queries.add_new_patron_query(db, patron)
+    patron = await patrons_queries.add_new_patron_query(db, patron)
     return patron
 
 
-def update_patron_service(db, patron_id: int, update_data: dict) -> patrons_models.Patron:
+async def update_patron_service(db, patron_id: int, update_data: dict) -> patrons_models.Patron:
     """
     Update a patron record.
     """
-    updated_patron = patrons_queries.update_patron_query(db, patron_id, update_data)
+    updated_patron = await patrons_queries.update_patron_query(db, patron_id, update_data)
     return updated_patron
 
 
-def borrow_book_service(db, patron_id, book_id):
+async def bulk_import_patrons_service(db, chunks, content_type):
+    """
+    Import patrons from a streamed NDJSON or CSV body.
+    """
+    report = imports.ImportReport()
+    records = imports.iter_records(chunks, content_type, report)
+    patrons = imports.validate_records(records, patrons_models.PatronCreate, report)
+    report.imported = await patrons_queries.bulk_import_patrons_query(db, patrons, report)
+    return report.to_result()
+
+
+async def borrow_book_service(db, patron_id, book_id):
     """
     Lends the book to the patron.
     """
-    loan_id = patrons_queries.borrow_book_query(db, patron_id, book_id)
+    loan_id = await patrons_queries.borrow_book_query(db, patron_id, book_id)
+    # available_copies changed
+    invalidate_book_cache(db, book_id)
     return loan_id
 
 
-def return_book_service(db, patron_id, book_id):
+async def return_book_service(db, patron_id, book_id):
     """
     Process the book return.
     """
-    patrons_queries.return_book(db, patron_id, book_id)
+    await patrons_queries.return_book(db, patron_id, book_id)
+    # available_copies changed
+    invalidate_book_cache(db, book_id)
+
+
+async def borrow_books_service(db, patron_id, book_ids, mode):
+    """
+    Lends several books to the patron at once.
+    """
+    committed, results = await patrons_queries.borrow_books_query(db, patron_id, book_ids, mode)
+    if committed:
+        # available_copies changed
+        for result in results:
+            if result["status"] == patrons_models.LoanStatus.BORROWED:
+                invalidate_book_cache(db, result["book_id"])
+    return patrons_models.BatchLoanResult(committed=committed, results=results)
+
+
+async def return_books_service(db, patron_id, book_ids, mode):
+    """
+    Process the return of several books at once.
+    """
+    committed, results = await patrons_queries.return_books_query(db, patron_id, book_ids, mode)
+    if committed:
+        # available_copies changed
+        for result in results:
+            if result["status"] == patrons_models.LoanStatus.RETURNED:
+                invalidate_book_cache(db, result["book_id"])
+    return patrons_models.BatchLoanResult(committed=committed, results=results)
+
+
+async def export_patrons_service(export_format):
+    """
+    Stream all patrons in the given format.
+    """
+    return stream_with_db(patrons_queries.export_patrons_query, export_format)
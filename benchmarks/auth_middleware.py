@@ -0,0 +1,132 @@
+"""
+Per-request overhead of the API key authentication middleware.
+
+Drives the ASGI stack in-process, without a server or database, so that the
+only difference between runs is the middleware itself. Compares a bare app,
+the previous BaseHTTPMiddleware implementation and the current pure ASGI one,
+for both authenticated and rejected requests.
+
+Usage:
+    python -m benchmarks.auth_middleware [--requests N]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+# The middleware only needs the API key; the DB settings are never used here.
+for _name in ("DB_HOST", "DB_NAME", "DB_USER", "DB_PASSWORD", "DB_PORT"):
+    os.environ.setdefault(_name, "")
+os.environ.setdefault("API_KEY", "benchmark-key")
+
+from fastapi import Request, status  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from app.core.APIKeyAuthMiddleware import APIKeyAuthMiddleware  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.constants import ErrorCode  # noqa: E402
+from app.models.responses import APIResponse, ErrorDetail  # noqa: E402
+
+
+class LegacyAPIKeyAuthMiddleware(BaseHTTPMiddleware):
+    """
+    The BaseHTTPMiddleware implementation the app used before, kept as the baseline.
+    """
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path in ["/docs", "/openapi.json", "/redoc"]:
+            return await call_next(request)
+
+        api_key = request.headers.get('X-API-KEY')
+        if api_key is None or api_key != settings.api_key:
+            response_data = APIResponse[None](
+                success=False,
+                message="Invalid or missing API Key",
+                data=None,
+                error=ErrorDetail(code=ErrorCode.UNAUTHORIZED)
+            )
+            return JSONResponse(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                content=response_data.model_dump()
+            )
+        return await call_next(request)
+
+
+async def endpoint(scope, receive, send):
+    """
+    Smallest possible endpoint: an empty 200 response.
+    """
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-length", b"0")]})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def make_scope(api_key: str | None) -> dict:
+    headers = [(b"host", b"testserver"), (b"user-agent", b"benchmark")]
+    if api_key is not None:
+        headers.append((b"x-api-key", api_key.encode()))
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/books/1",
+        "raw_path": b"/books/1",
+        "root_path": "",
+        "query_string": b"",
+        "headers": headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+
+
+async def run(app, scope: dict, requests: int) -> tuple[float, int]:
+    """
+    Send 'requests' requests through app and return (seconds, last status).
+    """
+    response_status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal response_status
+        if message["type"] == "http.response.start":
+            response_status = message["status"]
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return time.perf_counter() - started, response_status
+
+
+async def main(requests: int):
+    apps = {
+        "no middleware": endpoint,
+        "BaseHTTPMiddleware": LegacyAPIKeyAuthMiddleware(endpoint),
+        "pure ASGI": APIKeyAuthMiddleware(endpoint),
+    }
+    cases = {
+        "authorized": make_scope(settings.api_key),
+        "unauthorized": make_scope("wrong-key"),
+    }
+
+    baseline = {}
+    print(f"{'case':<14}{'middleware':<20}{'status':>7}{'us/req':>10}{'overhead':>10}")
+    for case, scope in cases.items():
+        for label, app in apps.items():
+            # Warm up imports, model caches and the event loop
+            await run(app, scope, min(requests, 1000))
+            seconds, response_status = await run(app, scope, requests)
+            per_request = seconds / requests * 1e6
+            baseline.setdefault(case, per_request)
+            overhead = per_request - baseline[case]
+            print(f"{case:<14}{label:<20}{response_status:>7}{per_request:>10.2f}{overhead:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,49 @@
+"""
+Compare two benchmarks.load reports.
+
+Prints throughput and p50/p99 latency per scenario and concurrency, with the
+relative change from the baseline report.
+
+Usage:
+    python -m benchmarks.compare baseline.json candidate.json
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+
+def change(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+
+    baseline = json.loads(Path(args.baseline).read_text())
+    candidate = json.loads(Path(args.candidate).read_text())
+    print(f"baseline  {baseline['meta'].get('git_revision')}")
+    print(f"candidate {candidate['meta'].get('git_revision')}")
+    print(f"{'scenario':<28}{'c':>5}{'req/s':>12}{'':>9}{'p50 ms':>10}{'':>9}{'p99 ms':>10}{'':>9}")
+
+    for name, levels in candidate["results"].items():
+        for concurrency, after in levels.items():
+            before = baseline["results"].get(name, {}).get(concurrency)
+            if before is None:
+                print(f"{name:<28}{concurrency:>5}{after['throughput_rps']:>12}   (new)")
+                continue
+            print(
+                f"{name:<28}{concurrency:>5}"
+                f"{after['throughput_rps']:>12}{change(before['throughput_rps'], after['throughput_rps']):>9}"
+                f"{after['p50_ms']:>10}{change(before['p50_ms'], after['p50_ms']):>9}"
+                f"{after['p99_ms']:>10}{change(before['p99_ms'], after['p99_ms']):>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
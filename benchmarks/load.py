@@ -0,0 +1,242 @@
+"""
+HTTP load benchmark of every API route.
+
+Seeds the database, starts app.main:app under uvicorn and drives each scenario
+at fixed concurrency levels for a fixed duration. The *.fast scenarios are
+driven against a second app started with FAST_LIST_RESPONSES on, so that the
+listings are measured both ways in the same run. Throughput and latency
+percentiles per scenario and concurrency are written to a JSON report meant
+to be diffed between commits (see benchmarks.compare).
+
+The app and the seeding read the DB settings from the environment (or .env),
+exactly like the app does. Point them at a disposable database: seeding
+truncates the library tables.
+
+Usage:
+    python -m benchmarks.load [--scale N] [--concurrency 1,8,32] [--duration S]
+                              [--only PREFIX] [--output bench.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+import httpx
+import psycopg
+from benchmarks.scenarios import SCENARIOS, BenchState, Scenario
+from benchmarks.seed import SeedSize, apply_schema, seed
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    """
+    Throughput and latency figures (in milliseconds) of one scenario run.
+    """
+    latencies.sort()
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "throughput_rps": round(count / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    state: BenchState,
+    concurrency: int,
+    duration: float
+) -> tuple[list[float], int, float]:
+    """
+    Run the scenario with 'concurrency' workers for 'duration' seconds.
+    Returns the request latencies, the error count and the elapsed time.
+    """
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(worker_id: int):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            requests = scenario.build(state, worker_id)
+            if requests is None:
+                return
+            for request in requests:
+                started = time.perf_counter()
+                response = await client.request(
+                    request.method, request.path, params=request.params, json=request.json)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors += 1
+                elif scenario.created:
+                    data = response.json()["data"]
+                    state.created[scenario.created].append(
+                        data if isinstance(data, int) else data["id"])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(worker_id) for worker_id in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def run_all(
+    base_url: str, fast_base_url: str | None, api_key: str, scenarios, size: SeedSize, args
+) -> dict:
+    state = BenchState(size=size)
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    results = {}
+    async with httpx.AsyncClient(
+        base_url=base_url, headers={"x-api-key": api_key}, limits=limits, timeout=30.0
+    ) as client, httpx.AsyncClient(
+        base_url=fast_base_url or base_url, headers={"x-api-key": api_key}, limits=limits, timeout=30.0
+    ) as fast_client:
+        for scenario in scenarios:
+            scenario_client = fast_client if scenario.fast_lists else client
+            results[scenario.name] = {}
+            for concurrency in args.concurrency:
+                if args.warmup:
+                    await run_scenario(scenario_client, scenario, state, concurrency, args.warmup)
+                latencies, errors, elapsed = await run_scenario(
+                    scenario_client, scenario, state, concurrency, args.duration)
+                summary = summarize(latencies, errors, elapsed)
+                results[scenario.name][str(concurrency)] = summary
+                print(
+                    f"{scenario.name:<28} c={concurrency:<4} {summary['throughput_rps']:>9} req/s  "
+                    f"p50 {summary['p50_ms']:>8} ms  p95 {summary['p95_ms']:>8} ms  "
+                    f"p99 {summary['p99_ms']:>8} ms  errors {errors}",
+                    flush=True
+                )
+    return results
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int, env: dict | None = None) -> subprocess.Popen:
+    """
+    Start the app under uvicorn, with 'env' added to the environment, and
+    wait until it serves requests.
+    """
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=REPO_ROOT,
+        env={**os.environ, **(env or {})}
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/openapi.json", timeout=1).status_code == 200:
+                return server
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("uvicorn did not start within 30 seconds")
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    from app.core.config import settings
+    from app.db.connection import get_conninfo
+
+    parser = argparse.ArgumentParser(description="HTTP load benchmark of the Library API.")
+    parser.add_argument("--scale", type=int, default=1, help="seed scale factor (1 = 1000 books)")
+    parser.add_argument("--concurrency", default="1,8,32",
+                        type=lambda value: [int(level) for level in value.split(",")])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario and concurrency")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unrecorded seconds before each run")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--only", action="append", help="run only scenarios starting with this prefix")
+    parser.add_argument("--schema", action="store_true", help="recreate the tables from schemas.sql first")
+    parser.add_argument("--no-seed", action="store_true", help="reuse a data set seeded at --scale")
+    parser.add_argument("--output", default="bench.json")
+    args = parser.parse_args()
+
+    scenarios = [
+        scenario for scenario in SCENARIOS
+        if not args.only or scenario.name.startswith(tuple(args.only))
+    ]
+
+    if args.no_seed:
+        size = SeedSize.for_scale(args.scale)
+    else:
+        with psycopg.connect(get_conninfo()) as conn:
+            if args.schema:
+                apply_schema(conn)
+            size = seed(conn, args.scale)
+
+    port = free_port()
+    servers = [start_server(port, args.workers)]
+    fast_base_url = None
+    try:
+        if any(scenario.fast_lists for scenario in scenarios):
+            fast_port = free_port()
+            servers.append(start_server(fast_port, args.workers, {"FAST_LIST_RESPONSES": "true"}))
+            fast_base_url = f"http://127.0.0.1:{fast_port}"
+        results = asyncio.run(run_all(
+            f"http://127.0.0.1:{port}", fast_base_url, settings.api_key, scenarios, size, args))
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "meta": {
+            "git_revision": git_revision(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "seed_size": vars(size),
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "workers": args.workers,
+        },
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Benchmark scenarios, one per route (or route and filter) of the API.
+
+A scenario builds the requests of one iteration for a given worker. Most
+iterations are a single request; the borrow/return scenarios are pairs so
+that every iteration leaves the loan state as it found it.
+"""
+
+import itertools
+import random
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable
+from benchmarks.seed import GENRES, LAST_NAMES, LOAN_FREE_PATRONS, TITLE_WORDS, SeedSize, isbn13
+
+# Books borrowed and returned at once by each iteration of the batch scenario
+BATCH_LOAN_BOOKS = 5
+
+
+@dataclass
+class BenchRequest:
+    """
+    A single HTTP request of a scenario iteration.
+    """
+    method: str
+    path: str
+    params: dict | None = None
+    json: dict | None = None
+
+
+@dataclass
+class BenchState:
+    """
+    State shared by the scenarios of a run: the seeded sizes and the records
+    created by the write scenarios, consumed by the update and delete ones.
+    """
+    size: SeedSize
+    rng: random.Random = field(default_factory=lambda: random.Random(7))
+    sequence: itertools.count = field(default_factory=lambda: itertools.count(1))
+    created: dict[str, deque] = field(
+        default_factory=lambda: {"books": deque(), "authors": deque(), "patrons": deque()})
+
+    def book_id(self) -> int:
+        return self.rng.randint(1, self.size.books)
+
+    def author_id(self) -> int:
+        return self.rng.randint(1, self.size.authors)
+
+    def patron_id(self) -> int:
+        return self.rng.randint(1, self.size.patrons)
+
+    def loan_patron_id(self) -> int:
+        """A patron with a seeded loan history."""
+        return self.rng.randint(LOAN_FREE_PATRONS + 1, self.size.patrons)
+
+    def created_id(self, entity: str, pop: bool = False) -> int | None:
+        ids = self.created[entity]
+        if not ids:
+            return None
+        if pop:
+            return ids.popleft()
+        ids.rotate(-1)
+        return ids[0]
+
+
+@dataclass
+class Scenario:
+    """
+    A named benchmark scenario.
+    'build' returns the requests of one iteration, or None once the
+    scenario has nothing left to do (e.g. no created record left to delete).
+    'created' names the entity whose id is collected from the responses.
+    'fast_lists' runs the scenario against an app started with
+    FAST_LIST_RESPONSES on, to compare with the same listing without it.
+    """
+    name: str
+    build: Callable[[BenchState, int], list[BenchRequest] | None]
+    created: str | None = None
+    fast_lists: bool = False
+
+
+def _get(path: str, params: dict | None = None) -> list[BenchRequest]:
+    return [BenchRequest("GET", path, params=params)]
+
+
+def _book_payload(state: BenchState) -> dict:
+    return {
+        "title": " ".join(state.rng.sample(TITLE_WORDS, 3)).title(),
+        # 979 prefix keeps created books clear of the seeded 978 ISBNs
+        "isbn": isbn13(next(state.sequence), prefix="979"),
+        "genre": state.rng.choice(GENRES),
+        "publication_date": "2001-01-01",
+        "available_copies": 3,
+        "author_ids": [state.author_id()],
+    }
+
+
+def _update_created(entity: str, payload: Callable[[BenchState], dict]):
+    def build(state: BenchState, worker: int):
+        created_id = state.created_id(entity)
+        if created_id is None:
+            return None
+        return [BenchRequest("PUT", f"/{entity}/{created_id}", json=payload(state))]
+    return build
+
+
+def _delete_created(entity: str):
+    def build(state: BenchState, worker: int):
+        created_id = state.created_id(entity, pop=True)
+        if created_id is None:
+            return None
+        return [BenchRequest("DELETE", f"/{entity}/{created_id}")]
+    return build
+
+
+def _borrow_return(state: BenchState, worker: int):
+    # Each worker owns a distinct (patron, book) pair, so loans never collide
+    patron_id = worker % LOAN_FREE_PATRONS + 1
+    book_id = worker % state.size.books + 1
+    params = {"book_id": book_id}
+    return [
+        BenchRequest("POST", f"/patrons/{patron_id}/borrow", params=params),
+        BenchRequest("POST", f"/patrons/{patron_id}/return", params=params),
+    ]
+
+
+def _borrow_return_batch(state: BenchState, worker: int):
+    # Each worker owns a patron and a distinct run of books, so loans never collide
+    patron_id = worker % LOAN_FREE_PATRONS + 1
+    first = worker * BATCH_LOAN_BOOKS
+    book_ids = [(first + offset) % state.size.books + 1 for offset in range(BATCH_LOAN_BOOKS)]
+    batch = {"book_ids": book_ids, "mode": "all_or_nothing"}
+    return [
+        BenchRequest("POST", f"/patrons/{patron_id}/borrow/batch", json=batch),
+        BenchRequest("POST", f"/patrons/{patron_id}/return/batch", json=batch),
+    ]
+
+
+SCENARIOS = [
+    # Books
+    Scenario("books.list", lambda s, w: _get("/books", {"limit": 20})),
+    Scenario("books.list.fast", lambda s, w: _get("/books", {"limit": 20}), fast_lists=True),
+    Scenario("books.search.q", lambda s, w: _get(
+        "/books", {"q": s.rng.choice(TITLE_WORDS), "limit": 20})),
+    Scenario("books.search.q_relevance", lambda s, w: _get(
+        "/books", {"q": s.rng.choice(TITLE_WORDS), "sort": "relevance", "limit": 20})),
+    Scenario("books.search.title", lambda s, w: _get(
+        "/books", {"title": s.rng.choice(TITLE_WORDS)[:4], "limit": 20})),
+    Scenario("books.search.title_fuzzy", lambda s, w: _get(
+        "/books", {"title": s.rng.choice(TITLE_WORDS), "fuzzy": "true", "limit": 20})),
+    Scenario("books.search.author", lambda s, w: _get(
+        "/books", {"author": s.rng.choice(LAST_NAMES)[:4], "limit": 20})),
+    Scenario("books.search.genre", lambda s, w: _get(
+        "/books", {"genre": s.rng.choice(GENRES), "limit": 20})),
+    Scenario("books.search.isbn", lambda s, w: _get(
+        "/books", {"isbn": isbn13(s.book_id())})),
+    Scenario("books.get", lambda s, w: _get(f"/books/{s.book_id()}")),
+    Scenario("books.create", lambda s, w: [
+        BenchRequest("POST", "/books", json=_book_payload(s))], created="books"),
+    Scenario("books.update", _update_created("books", lambda s: {
+        "title": " ".join(s.rng.sample(TITLE_WORDS, 2)).title(),
+        "available_copies": s.rng.randint(1, 10),
+    })),
+    Scenario("books.delete", _delete_created("books")),
+
+    # Authors
+    Scenario("authors.list", lambda s, w: _get("/authors", {"limit": 20})),
+    Scenario("authors.list.fast", lambda s, w: _get("/authors", {"limit": 20}), fast_lists=True),
+    Scenario("authors.list.include_books", lambda s, w: _get(
+        "/authors", {"limit": 20, "include": "books"})),
+    Scenario("authors.get", lambda s, w: _get(f"/authors/{s.author_id()}")),
+    Scenario("authors.get.include_books", lambda s, w: _get(
+        f"/authors/{s.author_id()}", {"include": "books"})),
+    Scenario("authors.create", lambda s, w: [BenchRequest("POST", "/authors", json={
+        "first_name": "Bench", "last_name": f"Author {next(s.sequence)}", "date_of_birth": "1970-01-01",
+    })], created="authors"),
+    Scenario("authors.update", _update_created("authors", lambda s: {
+        "last_name": f"Author {next(s.sequence)}",
+    })),
+
+    # Patrons
+    Scenario("patrons.list", lambda s, w: _get("/patrons", {"limit": 20})),
+    Scenario("patrons.list.fast", lambda s, w: _get("/patrons", {"limit": 20}), fast_lists=True),
+    Scenario("patrons.get", lambda s, w: _get(f"/patrons/{s.patron_id()}")),
+    Scenario("patrons.create", lambda s, w: [BenchRequest("POST", "/patrons", json={
+        "first_name": "Bench", "last_name": "Patron", "email": f"bench{next(s.sequence)}@example.com",
+    })], created="patrons"),
+    Scenario("patrons.update", _update_created("patrons", lambda s: {
+        "email": f"bench{next(s.sequence)}@example.com",
+    })),
+    Scenario("patrons.borrow_return", _borrow_return),
+    Scenario("patrons.borrow_return.batch", _borrow_return_batch),
+    Scenario("patrons.loans", lambda s, w: _get(f"/patrons/{s.loan_patron_id()}/loans", {"limit": 20})),
+    Scenario("patrons.loans.fast", lambda s, w: _get(
+        f"/patrons/{s.loan_patron_id()}/loans", {"limit": 20}), fast_lists=True),
+    Scenario("patrons.loans.active", lambda s, w: _get(
+        f"/patrons/{s.loan_patron_id()}/loans", {"status": "active", "limit": 20})),
+    Scenario("patrons.loans.overdue", lambda s, w: _get(
+        f"/patrons/{s.loan_patron_id()}/loans", {"status": "overdue", "limit": 20})),
+
+    # Loans
+    Scenario("loans.overdue", lambda s, w: _get("/loans/overdue", {"limit": 20})),
+    Scenario("loans.overdue.fast", lambda s, w: _get("/loans/overdue", {"limit": 20}), fast_lists=True),
+    Scenario("loans.overdue.genre", lambda s, w: _get(
+        "/loans/overdue", {"genre": s.rng.choice(GENRES), "limit": 20})),
+    Scenario("loans.overdue.min_days", lambda s, w: _get(
+        "/loans/overdue", {"min_days_overdue": s.rng.randint(1, 365), "limit": 20})),
+    Scenario("loans.overdue.patrons", lambda s, w: _get("/loans/overdue/patrons", {"limit": 20})),
+    Scenario("loans.overdue.export", lambda s, w: _get("/loans/overdue/export")),
+    Scenario("loans.overdue.export_csv", lambda s, w: _get("/loans/overdue/export", {"format": "csv"})),
+]
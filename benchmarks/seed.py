@@ -0,0 +1,175 @@
+"""
+Deterministic benchmark data set.
+
+Replaces the contents of the library tables with generated authors, books,
+patrons and loans. The row counts grow linearly with the scale factor, and the
+same scale and seed always produce the same rows. Loan dates are relative to
+the day of seeding, so that a share of the active loans is always overdue.
+
+Usage:
+    python -m benchmarks.seed [--scale N] [--schema]
+"""
+
+import argparse
+import random
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+import psycopg
+
+SCHEMA_FILE = Path(__file__).resolve().parent.parent / "schemas.sql"
+
+FIRST_NAMES = [
+    "Ada", "Alan", "Barbara", "Claude", "Donald", "Edsger", "Frances", "Grace",
+    "Herbert", "Ivan", "John", "Katherine", "Leslie", "Margaret", "Niklaus",
+    "Ole", "Peter", "Radia", "Shafi", "Tony", "Ursula", "Vint", "Whitfield",
+]
+LAST_NAMES = [
+    "Lovelace", "Turing", "Liskov", "Shannon", "Knuth", "Dijkstra", "Allen",
+    "Hopper", "Simon", "Sutherland", "McCarthy", "Johnson", "Lamport",
+    "Hamilton", "Wirth", "Dahl", "Naur", "Perlman", "Goldwasser", "Hoare",
+    "Le Guin", "Cerf", "Diffie",
+]
+TITLE_WORDS = [
+    "galaxy", "ring", "foundation", "dune", "empire", "shadow", "river",
+    "machine", "garden", "winter", "silence", "engine", "harbor", "storm",
+    "library", "voyage", "mirror", "forest", "signal", "kingdom", "orbit",
+    "memory", "lantern", "desert", "tower", "ocean", "secret", "clock",
+]
+GENRES = [
+    "Science Fiction", "Fantasy", "Dystopian", "Mystery", "Thriller",
+    "Romance", "Historical Fiction", "Horror", "Biography", "Poetry",
+]
+
+
+# Patrons left without seeded loans, owned by the borrow and return scenarios
+# whose workers must not run into an active loan of their books
+LOAN_FREE_PATRONS = 100
+# Most loans in the history of a seeded patron, and of those still active
+MAX_PATRON_LOANS = 30
+MAX_ACTIVE_LOANS = 4
+LOAN_DAYS = 14
+
+
+@dataclass
+class SeedSize:
+    """
+    Row counts of a seeded data set.
+    """
+    authors: int
+    books: int
+    patrons: int
+
+    @classmethod
+    def for_scale(cls, scale: int) -> "SeedSize":
+        return cls(authors=200 * scale, books=1000 * scale, patrons=500 * scale)
+
+
+def isbn13(number: int, prefix: str = "978") -> str:
+    """
+    Build a valid ISBN-13 from a prefix and a sequence number.
+    """
+    body = f"{prefix}{number:09d}"
+    total = sum(int(digit) * (1 if i % 2 == 0 else 3) for i, digit in enumerate(body))
+    return f"{body}{(10 - total % 10) % 10}"
+
+
+def seed(conn: psycopg.Connection, scale: int = 1, random_seed: int = 42) -> SeedSize:
+    """
+    Truncate the library tables and load a generated data set of the given scale.
+    """
+    size = SeedSize.for_scale(scale)
+    rng = random.Random(random_seed)
+
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "TRUNCATE loans, book_authors, books, authors, patrons RESTART IDENTITY CASCADE;")
+
+        with cursor.copy("COPY authors (first_name, last_name, date_of_birth) FROM STDIN") as copy:
+            for _ in range(size.authors):
+                copy.write_row((
+                    rng.choice(FIRST_NAMES),
+                    rng.choice(LAST_NAMES),
+                    date(1900, 1, 1) + timedelta(days=rng.randrange(36500)),
+                ))
+
+        with cursor.copy(
+            "COPY books (title, isbn, genre, publication_date, available_copies) FROM STDIN"
+        ) as copy:
+            for number in range(1, size.books + 1):
+                words = rng.sample(TITLE_WORDS, rng.randint(1, 4))
+                copy.write_row((
+                    " ".join(words).title(),
+                    isbn13(number),
+                    rng.choice(GENRES),
+                    date(1950, 1, 1) + timedelta(days=rng.randrange(27000)),
+                    rng.randint(1, 10),
+                ))
+
+        # One to three distinct authors per book; identities restart at 1
+        with cursor.copy("COPY book_authors (book_id, author_id) FROM STDIN") as copy:
+            for book_id in range(1, size.books + 1):
+                for author_id in rng.sample(range(1, size.authors + 1), rng.randint(1, 3)):
+                    copy.write_row((book_id, author_id))
+
+        with cursor.copy(
+            "COPY patrons (first_name, last_name, email, registration_date) FROM STDIN"
+        ) as copy:
+            for number in range(1, size.patrons + 1):
+                copy.write_row((
+                    rng.choice(FIRST_NAMES),
+                    rng.choice(LAST_NAMES),
+                    f"patron{number}@example.com",
+                    date(2020, 1, 1) + timedelta(days=rng.randrange(1500)),
+                ))
+
+        # Loan histories, newest loans still active; available_copies are left
+        # as seeded, so that every book can still be borrowed
+        today = date.today()
+        with cursor.copy(
+            "COPY loans (patron_id, book_id, loan_date, due_date, return_date) FROM STDIN"
+        ) as copy:
+            for patron_id in range(LOAN_FREE_PATRONS + 1, size.patrons + 1):
+                count = rng.randint(0, MAX_PATRON_LOANS)
+                active = min(count, rng.randint(0, MAX_ACTIVE_LOANS))
+                loan_dates = sorted(
+                    (today - timedelta(days=rng.randrange(1, 1000)) for _ in range(count)), reverse=True)
+                book_ids = rng.sample(range(1, size.books + 1), count)
+                for position, (loan_date, book_id) in enumerate(zip(loan_dates, book_ids)):
+                    due_date = loan_date + timedelta(days=LOAN_DAYS)
+                    return_date = None
+                    if position >= active:
+                        return_date = min(today, loan_date + timedelta(days=rng.randint(1, 2 * LOAN_DAYS)))
+                    copy.write_row((patron_id, book_id, loan_date, due_date, return_date))
+
+        cursor.execute("ANALYZE authors, books, book_authors, patrons, loans;")
+    conn.commit()
+    return size
+
+
+def apply_schema(conn: psycopg.Connection):
+    """
+    Recreate the tables from schemas.sql.
+    """
+    conn.execute(SCHEMA_FILE.read_text())
+    conn.commit()
+
+
+def main():
+    from app.db.connection import get_conninfo
+
+    parser = argparse.ArgumentParser(description="Seed the library database for benchmarking.")
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--schema", action="store_true", help="recreate the tables from schemas.sql first")
+    args = parser.parse_args()
+
+    with psycopg.connect(get_conninfo()) as conn:
+        if args.schema:
+            apply_schema(conn)
+        size = seed(conn, args.scale, args.seed)
+    print(f"Seeded {size.authors} authors, {size.books} books, {size.patrons} patrons and their loans")
+
+
+if __name__ == "__main__":
+    main()
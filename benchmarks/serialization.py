@@ -0,0 +1,135 @@
+"""
+Cost of serializing a books listing page.
+
+Drives the ASGI stack in-process, without a server or database, with the
+same page of rows returned both ways: through the response models, as the
+listing endpoints do by default, and through the orjson fast path enabled by
+FAST_LIST_RESPONSES.
+
+Usage:
+    python -m benchmarks.serialization [--requests N] [--limit N]
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import date
+from fastapi import FastAPI
+from app.core import fast_responses
+from app.models import books as books_models
+from app.models.responses import PaginatedAPIResponse, PageMeta
+from benchmarks.seed import GENRES, LAST_NAMES, TITLE_WORDS, isbn13
+
+
+def make_rows(limit: int) -> list[dict]:
+    """
+    A page of rows shaped like the ones of the books listing query.
+    """
+    return [
+        {
+            "id": i,
+            "title": f"{TITLE_WORDS[i % len(TITLE_WORDS)]} {i}".title(),
+            "isbn": isbn13(i),
+            "genre": GENRES[i % len(GENRES)],
+            "publication_date": date(1950 + i % 70, 1 + i % 12, 1 + i % 28),
+            "available_copies": i % 5,
+            "authors": [
+                {"id": i * 2 + n, "first_name": "First", "last_name": LAST_NAMES[(i + n) % len(LAST_NAMES)]}
+                for n in range(1 + i % 2)
+            ],
+        }
+        for i in range(1, limit + 1)
+    ]
+
+
+def make_app(limit: int) -> FastAPI:
+    app = FastAPI()
+
+    # Every handler builds fresh rows, as each request gets new ones from the DB
+    @app.get("/models")
+    async def models_path() -> PaginatedAPIResponse[list[books_models.Book]]:
+        return PaginatedAPIResponse(
+            data=make_rows(limit),
+            message="Books fetched successfully",
+            meta=PageMeta(next_cursor="cursor")
+        )
+
+    @app.get("/fast")
+    async def fast_path() -> PaginatedAPIResponse[list[books_models.Book]]:
+        return fast_responses.envelope_response(
+            make_rows(limit), "Books fetched successfully", {"next_cursor": "cursor"})
+
+    @app.get("/rows")
+    async def rows_only() -> None:
+        make_rows(limit)
+
+    return app
+
+
+def make_scope(path: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"testserver"), (b"user-agent", b"benchmark")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+
+
+async def run(app, scope: dict, requests: int) -> tuple[float, int, int]:
+    """
+    Send 'requests' requests through app and return (seconds, last status, last body size).
+    """
+    response_status = 0
+    body_size = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal response_status, body_size
+        if message["type"] == "http.response.start":
+            response_status = message["status"]
+        elif message["type"] == "http.response.body":
+            body_size = len(message.get("body", b""))
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return time.perf_counter() - started, response_status, body_size
+
+
+async def main(requests: int, limit: int):
+    app = make_app(limit)
+    paths = {
+        "rows only": "/rows",
+        "response models": "/models",
+        "orjson fast path": "/fast",
+    }
+
+    baseline = None
+    print(f"{'path':<20}{'status':>7}{'bytes':>8}{'us/req':>10}{'serialize':>11}")
+    for label, path in paths.items():
+        scope = make_scope(path)
+        # Warm up model caches and the event loop
+        await run(app, scope, min(requests, 200))
+        seconds, response_status, body_size = await run(app, scope, requests)
+        per_request = seconds / requests * 1e6
+        if baseline is None:
+            baseline = per_request
+        print(f"{label:<20}{response_status:>7}{body_size:>8}{per_request:>10.1f}{per_request - baseline:>11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=100, help="Books per page")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.limit))
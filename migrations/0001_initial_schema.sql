@@ -0,0 +1,136 @@
+-- Baseline schema.
+-- Creates the schema on an empty database and brings a database created by
+-- an earlier schemas.sql up to date. Every statement is idempotent.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE TABLE IF NOT EXISTS authors (
+    id SERIAL PRIMARY KEY,
+    first_name VARCHAR(255) NOT NULL,
+    last_name VARCHAR(255) NOT NULL,
+    date_of_birth DATE
+);
+
+CREATE TABLE IF NOT EXISTS books (
+    id SERIAL PRIMARY KEY,
+    title VARCHAR(255) NOT NULL,
+    isbn VARCHAR(13) UNIQUE NOT NULL,
+    genre VARCHAR(255),
+    publication_date DATE,
+    available_copies INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS book_authors (
+    book_id INTEGER REFERENCES books (id) ON DELETE CASCADE,
+    author_id INTEGER REFERENCES authors (id) ON DELETE CASCADE,
+    PRIMARY KEY (book_id, author_id)
+);
+
+CREATE TABLE IF NOT EXISTS patrons (
+    id SERIAL PRIMARY KEY,
+    first_name VARCHAR(255) NOT NULL,
+    last_name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    registration_date DATE NOT NULL DEFAULT CURRENT_DATE
+);
+
+CREATE TABLE IF NOT EXISTS loans (
+    id SERIAL PRIMARY KEY,
+    book_id INTEGER REFERENCES books (id) ON DELETE RESTRICT,
+    patron_id INTEGER REFERENCES patrons (id) ON DELETE RESTRICT,
+    loan_date DATE NOT NULL DEFAULT CURRENT_DATE,
+    due_date DATE NOT NULL,
+    return_date DATE
+);
+
+-- Full-text search document of the books listing
+ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector TSVECTOR GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(genre, '')), 'B')
+) STORED;
+
+-- Denormalized [{id, first_name, last_name}] of the book's authors
+ALTER TABLE books ADD COLUMN IF NOT EXISTS authors JSONB NOT NULL DEFAULT '[]'::jsonb;
+
+-- Recompute books.authors for the given books in one statement
+CREATE OR REPLACE FUNCTION refresh_book_authors(book_ids INTEGER[]) RETURNS VOID AS $$
+    UPDATE books b
+    SET authors = COALESCE(
+        (
+            SELECT jsonb_agg(
+                jsonb_build_object('id', a.id, 'first_name', a.first_name, 'last_name', a.last_name)
+                ORDER BY a.id
+            )
+            FROM book_authors ba
+            JOIN authors a ON a.id = ba.author_id
+            WHERE ba.book_id = b.id
+        ),
+        '[]'::jsonb
+    )
+    WHERE b.id = ANY(book_ids);
+$$ LANGUAGE sql;
+
+-- Statement level, so that bulk link changes refresh each book once
+CREATE OR REPLACE FUNCTION book_authors_links_inserted() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_book_authors(ARRAY(SELECT DISTINCT book_id FROM new_links));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION book_authors_links_deleted() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_book_authors(ARRAY(SELECT DISTINCT book_id FROM old_links));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION book_authors_links_updated() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_book_authors(ARRAY(
+        SELECT book_id FROM old_links UNION SELECT book_id FROM new_links
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Renaming authors refreshes all of their books in a single statement
+CREATE OR REPLACE FUNCTION authors_renamed() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_book_authors(ARRAY(
+        SELECT DISTINCT ba.book_id
+        FROM new_authors n
+        JOIN old_authors o ON o.id = n.id
+        JOIN book_authors ba ON ba.author_id = n.id
+        WHERE (n.first_name, n.last_name) IS DISTINCT FROM (o.first_name, o.last_name)
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS book_authors_links_inserted ON book_authors;
+CREATE TRIGGER book_authors_links_inserted
+AFTER INSERT ON book_authors
+REFERENCING NEW TABLE AS new_links
+FOR EACH STATEMENT EXECUTE FUNCTION book_authors_links_inserted();
+
+DROP TRIGGER IF EXISTS book_authors_links_deleted ON book_authors;
+CREATE TRIGGER book_authors_links_deleted
+AFTER DELETE ON book_authors
+REFERENCING OLD TABLE AS old_links
+FOR EACH STATEMENT EXECUTE FUNCTION book_authors_links_deleted();
+
+DROP TRIGGER IF EXISTS book_authors_links_updated ON book_authors;
+CREATE TRIGGER book_authors_links_updated
+AFTER UPDATE ON book_authors
+REFERENCING OLD TABLE AS old_links NEW TABLE AS new_links
+FOR EACH STATEMENT EXECUTE FUNCTION book_authors_links_updated();
+
+DROP TRIGGER IF EXISTS authors_renamed ON authors;
+CREATE TRIGGER authors_renamed
+AFTER UPDATE ON authors
+REFERENCING OLD TABLE AS old_authors NEW TABLE AS new_authors
+FOR EACH STATEMENT EXECUTE FUNCTION authors_renamed();
+
+-- Backfill the denormalized authors of existing books
+SELECT refresh_book_authors(ARRAY(SELECT id FROM books));
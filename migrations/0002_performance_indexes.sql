@@ -0,0 +1,47 @@
+-- migrate:no-transaction
+-- Indexes the listing, search, borrow and return queries rely on, built
+-- without blocking writes. Existing indexes are kept; the migrator drops the
+-- INVALID ones left by an interrupted build first, so they are built again.
+
+-- Duplicate active loans would fail the unique index build midway; stop
+-- before building any index instead
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM loans
+        WHERE return_date IS NULL
+        GROUP BY patron_id, book_id
+        HAVING count(*) > 1
+    ) THEN
+        RAISE EXCEPTION 'loans holds several active loans of the same book by the same patron'
+            USING HINT = 'Close the duplicates (return_date IS NULL) before running this migration again.';
+    END IF;
+END
+$$;
+
+-- (title, id) ordering and keyset pagination of the books listing
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_books_title_id ON books (title, id);
+
+-- Search filters of the books listing
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_books_search_vector ON books USING GIN (search_vector);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_books_title_trgm ON books USING GIN (title gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_books_genre_trgm ON books USING GIN (genre gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_authors_first_name_trgm ON authors USING GIN (first_name gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_authors_last_name_trgm ON authors USING GIN (last_name gin_trgm_ops);
+
+-- Books of an author (author search, ?include=books, author deletes)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_book_authors_author_id ON book_authors (author_id);
+
+-- A patron can hold a single active loan per book; also serves the
+-- active loan lookups of borrow and return
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_loans_active_patron_book ON loans (patron_id, book_id) WHERE return_date IS NULL;
+
+-- Loans of a patron, and the ON DELETE RESTRICT check of patrons
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_loans_patron_id ON loans (patron_id);
+
+-- Loans of a book, and the ON DELETE RESTRICT check of books
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_loans_book_id ON loans (book_id);
+
+-- Active loans by due date, for overdue lookups
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_loans_active_due_date ON loans (due_date) WHERE return_date IS NULL;
@@ -0,0 +1,30 @@
+-- Row versions of books, authors and patrons, served as ETags by their
+-- single record reads. Every update bumps the version of the rows it
+-- touches, including the updates made by the denormalized authors triggers.
+
+-- Adding a column with a constant default doesn't rewrite the table
+ALTER TABLE books ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE authors ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE patrons ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+
+CREATE OR REPLACE FUNCTION bump_row_version() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS books_bump_version ON books;
+CREATE TRIGGER books_bump_version
+BEFORE UPDATE ON books
+FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+
+DROP TRIGGER IF EXISTS authors_bump_version ON authors;
+CREATE TRIGGER authors_bump_version
+BEFORE UPDATE ON authors
+FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+
+DROP TRIGGER IF EXISTS patrons_bump_version ON patrons;
+CREATE TRIGGER patrons_bump_version
+BEFORE UPDATE ON patrons
+FOR EACH ROW EXECUTE FUNCTION bump_row_version();
@@ -0,0 +1,15 @@
+-- migrate:no-transaction
+-- Covering indexes of a patron's loans, newest first, so that the loan
+-- history pages are index-only scans on loans. Only on loans: the book
+-- titles of a page are still joined in through the books primary key.
+
+-- Every loan of a patron; also serves lookups by patron_id alone, such as
+-- the ON DELETE RESTRICT check of patrons, in place of idx_loans_patron_id
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_loans_patron_history ON loans (patron_id, loan_date DESC, id DESC)
+    INCLUDE (book_id, due_date, return_date);
+
+-- Current loans of a patron, however long their history
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_loans_patron_active ON loans (patron_id, loan_date DESC, id DESC)
+    INCLUDE (book_id, due_date, return_date) WHERE return_date IS NULL;
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_loans_patron_id;
@@ -9,12 +9,20 @@ DROP TABLE IF EXISTS authors CASCADE;
 
 DROP TABLE IF EXISTS patrons CASCADE;
 
+DROP TABLE IF EXISTS schema_migrations CASCADE;
+
+-- Extensions
+-- Trigram indexes for substring and fuzzy search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- Create new tables
 CREATE TABLE authors (
     id SERIAL PRIMARY KEY,
     first_name VARCHAR(255) NOT NULL,
     last_name VARCHAR(255) NOT NULL,
-    date_of_birth DATE
+    date_of_birth DATE,
+    -- Bumped by every update, served as the ETag of the author
+    version INTEGER NOT NULL DEFAULT 1
 );
 
 CREATE TABLE books (
@@ -23,7 +31,16 @@ CREATE TABLE books (
     isbn VARCHAR(13) UNIQUE NOT NULL,
     genre VARCHAR(255),
     publication_date DATE,
-    available_copies INTEGER NOT NULL DEFAULT 0
+    available_copies INTEGER NOT NULL DEFAULT 0,
+    -- Denormalized [{id, first_name, last_name}] of the book's authors,
+    -- maintained by the triggers below
+    authors JSONB NOT NULL DEFAULT '[]'::jsonb,
+    -- Bumped by every update, served as the ETag of the book
+    version INTEGER NOT NULL DEFAULT 1,
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(genre, '')), 'B')
+    ) STORED
 );
 
 CREATE TABLE book_authors (
@@ -37,7 +54,9 @@ CREATE TABLE patrons (
     first_name VARCHAR(255) NOT NULL,
     last_name VARCHAR(255) NOT NULL,
     email VARCHAR(255) UNIQUE NOT NULL,
-    registration_date DATE NOT NULL DEFAULT CURRENT_DATE
+    registration_date DATE NOT NULL DEFAULT CURRENT_DATE,
+    -- Bumped by every update, served as the ETag of the patron
+    version INTEGER NOT NULL DEFAULT 1
 );
 
 CREATE TABLE loans (
@@ -48,3 +67,145 @@ CREATE TABLE loans (
     due_date DATE NOT NULL,
     return_date DATE
 );
+
+-- Indexes
+-- Serves the (title, id) ordering and keyset pagination of the books listing
+CREATE INDEX idx_books_title_id ON books (title, id);
+
+-- Serve the search filters of the books listing
+CREATE INDEX idx_books_search_vector ON books USING GIN (search_vector);
+CREATE INDEX idx_books_title_trgm ON books USING GIN (title gin_trgm_ops);
+CREATE INDEX idx_books_genre_trgm ON books USING GIN (genre gin_trgm_ops);
+CREATE INDEX idx_authors_first_name_trgm ON authors USING GIN (first_name gin_trgm_ops);
+CREATE INDEX idx_authors_last_name_trgm ON authors USING GIN (last_name gin_trgm_ops);
+CREATE INDEX idx_book_authors_author_id ON book_authors (author_id);
+
+-- A patron can hold a single active loan per book
+CREATE UNIQUE INDEX idx_loans_active_patron_book ON loans (patron_id, book_id) WHERE return_date IS NULL;
+
+-- Loans of a patron newest first, covering the loan history pages; also
+-- serves the ON DELETE RESTRICT check of patrons
+CREATE INDEX idx_loans_patron_history ON loans (patron_id, loan_date DESC, id DESC)
+    INCLUDE (book_id, due_date, return_date);
+
+-- Current loans of a patron, however long their history
+CREATE INDEX idx_loans_patron_active ON loans (patron_id, loan_date DESC, id DESC)
+    INCLUDE (book_id, due_date, return_date) WHERE return_date IS NULL;
+
+-- Loans of a book, and the ON DELETE RESTRICT check of books
+CREATE INDEX idx_loans_book_id ON loans (book_id);
+
+-- Active loans by due date, for overdue lookups
+CREATE INDEX idx_loans_active_due_date ON loans (due_date) WHERE return_date IS NULL;
+
+-- Denormalized authors
+-- Recompute books.authors for the given books in one statement
+CREATE OR REPLACE FUNCTION refresh_book_authors(book_ids INTEGER[]) RETURNS VOID AS $$
+    UPDATE books b
+    SET authors = COALESCE(
+        (
+            SELECT jsonb_agg(
+                jsonb_build_object('id', a.id, 'first_name', a.first_name, 'last_name', a.last_name)
+                ORDER BY a.id
+            )
+            FROM book_authors ba
+            JOIN authors a ON a.id = ba.author_id
+            WHERE ba.book_id = b.id
+        ),
+        '[]'::jsonb
+    )
+    WHERE b.id = ANY(book_ids);
+$$ LANGUAGE sql;
+
+-- Statement level, so that bulk link changes refresh each book once
+CREATE OR REPLACE FUNCTION book_authors_links_inserted() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_book_authors(ARRAY(SELECT DISTINCT book_id FROM new_links));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION book_authors_links_deleted() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_book_authors(ARRAY(SELECT DISTINCT book_id FROM old_links));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION book_authors_links_updated() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_book_authors(ARRAY(
+        SELECT book_id FROM old_links UNION SELECT book_id FROM new_links
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Renaming authors refreshes all of their books in a single statement
+CREATE OR REPLACE FUNCTION authors_renamed() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_book_authors(ARRAY(
+        SELECT DISTINCT ba.book_id
+        FROM new_authors n
+        JOIN old_authors o ON o.id = n.id
+        JOIN book_authors ba ON ba.author_id = n.id
+        WHERE (n.first_name, n.last_name) IS DISTINCT FROM (o.first_name, o.last_name)
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER book_authors_links_inserted
+AFTER INSERT ON book_authors
+REFERENCING NEW TABLE AS new_links
+FOR EACH STATEMENT EXECUTE FUNCTION book_authors_links_inserted();
+
+CREATE TRIGGER book_authors_links_deleted
+AFTER DELETE ON book_authors
+REFERENCING OLD TABLE AS old_links
+FOR EACH STATEMENT EXECUTE FUNCTION book_authors_links_deleted();
+
+CREATE TRIGGER book_authors_links_updated
+AFTER UPDATE ON book_authors
+REFERENCING OLD TABLE AS old_links NEW TABLE AS new_links
+FOR EACH STATEMENT EXECUTE FUNCTION book_authors_links_updated();
+
+CREATE TRIGGER authors_renamed
+AFTER UPDATE ON authors
+REFERENCING OLD TABLE AS old_authors NEW TABLE AS new_authors
+FOR EACH STATEMENT EXECUTE FUNCTION authors_renamed();
+
+-- Row versions
+CREATE OR REPLACE FUNCTION bump_row_version() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER books_bump_version
+BEFORE UPDATE ON books
+FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+
+CREATE TRIGGER authors_bump_version
+BEFORE UPDATE ON authors
+FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+
+CREATE TRIGGER patrons_bump_version
+BEFORE UPDATE ON patrons
+FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+
+-- Schema migrations
+-- This script creates the schema at the latest migration, so every migration
+-- in migrations/ is recorded as applied. Keep in step with new migrations.
+CREATE TABLE schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO schema_migrations (version, name) VALUES
+(1, 'initial_schema'),
+(2, 'performance_indexes'),
+(3, 'row_versions'),
+(4, 'patron_loan_indexes');